@@ -0,0 +1,45 @@
+import numpy as np
+
+
+def pad_trials(series_list, length=None):
+    """Function to arrange ragged per-trial series into a 2-D array.
+
+    Args:
+        series_list (List[List[float]]): series (e.g. latency of each request) for each trial.
+        length (int): number of elements for each trial (default None for length of the shortest series).
+            Longer series are truncated, and shorter series are padded with NaN.
+
+    Returns:
+        np.ndarray: trials x length array of floats.
+    """
+
+    if length is None:
+        length = min([len(series) for series in series_list], default=0)
+
+    arr = np.full((len(series_list), length), np.nan)
+    for i, series in enumerate(series_list):
+        series = np.asarray(series[:length], dtype=float)
+        arr[i, :len(series)] = series
+    return arr
+
+
+def aggregate_trials(series_list, percentiles=(5, 95), length=None):
+    """Function to compute the mean and percentiles of per-trial series along the trial axis.
+
+    Args:
+        series_list (List[List[float]]): series for each trial.
+        percentiles (Tuple[float]): percentiles to compute (default 5th and 95th).
+        length (int): number of elements for each trial (default None for length of the shortest series).
+            Missing elements of shorter series are ignored.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: mean of each element, and array with a row for each percentile.
+    """
+
+    arr = pad_trials(series_list, length)
+    if arr.size == 0:
+        return np.zeros(arr.shape[1]), np.zeros((len(percentiles), arr.shape[1]))
+
+    if np.isnan(arr).any():
+        return np.nanmean(arr, axis=0), np.nanpercentile(arr, percentiles, axis=0)
+    return arr.mean(axis=0), np.percentile(arr, percentiles, axis=0)
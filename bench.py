@@ -0,0 +1,228 @@
+import json
+import os
+import platform
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from time import time
+
+from main import get_config, run_experiment
+from profiling import merge_stats
+from sweep import get_code_version
+
+
+# benchmark parameters
+BENCH_NET_TYPES = ["ring", "grid", "as_net"]
+BENCH_NET_SIZES = [16, 36, 64]  # square numbers, so that grids have the requested size
+BENCH_MEMO_SIZES = [5, 10]
+BENCH_SCHEMES = ["adaptive", "uniform", "powerlaw"]
+BENCH_END_TIME = 5000
+BENCH_TRIALS = 1
+BENCH_SEED = 0
+BENCH_DIR = "bench_networks"  # directory for generated network files
+BASELINE = "bench_baseline.json"  # previous results to compare with (skipped if the file does not exist)
+OUTPUT = "bench_results.json"
+TOLERANCE = 0.1  # relative change of steps per second reported as a regression or improvement
+
+
+def get_case_key(net_type, net_size, memo_size, scheme):
+    return "{}_{}_{}_{}".format(net_type, net_size, memo_size, scheme)
+
+
+def gen_bench_configs(net_types=None, net_sizes=None, memo_sizes=None, schemes=None, base_config=None):
+    """Function to generate the configuration of each benchmark case.
+
+    Networks and traffic matrices are generated from the fixed seed, so that every run of a case is identical.
+
+    Args:
+        net_types (List[str]): network types for `gen_network_json` (default BENCH_NET_TYPES).
+        net_sizes (List[int]): numbers of nodes (default BENCH_NET_SIZES).
+        memo_sizes (List[int]): numbers of memories per node (default BENCH_MEMO_SIZES).
+        schemes (List[str]): generation schemes (default BENCH_SCHEMES).
+        base_config (Dict[str, any]): values of all other parameters (default from `main.get_config`).
+
+    Returns:
+        Dict[str, Dict[str, any]]: configuration of each case, keyed by `get_case_key`.
+    """
+
+    if base_config is None:
+        base_config = get_config()
+    os.makedirs(BENCH_DIR, exist_ok=True)
+
+    configs = {}
+    for net_type, net_size, memo_size, scheme in product(net_types or BENCH_NET_TYPES, net_sizes or BENCH_NET_SIZES,
+                                                         memo_sizes or BENCH_MEMO_SIZES, schemes or BENCH_SCHEMES):
+        config = dict(base_config)
+        config.update({"CONFIG": os.path.join(BENCH_DIR, "net_{}_{}.json".format(net_type, net_size)),
+                       "GENERATE_NEW_NET": True,
+                       "GENERATE_NEW_TRAFFIC": True,
+                       "TRAFFIC_SCHEDULE": None,
+                       "TRACE": None,
+                       "NET_TYPE": net_type,
+                       "NET_SIZE": net_size,
+                       "MEMO_SIZE": memo_size,
+                       "CONTINUOUS_SCHEME": scheme,
+                       "SIM_SEED": BENCH_SEED,
+                       "END_TIME": BENCH_END_TIME,
+                       "NUM_TRIALS": BENCH_TRIALS,
+                       "PROFILE": False,
+                       "MEMORY_REPORT": False})
+        configs[get_case_key(net_type, net_size, memo_size, scheme)] = config
+    return configs
+
+
+def get_peak_memory():
+    # resource is only available on Unix, peak memory is not measured on other platforms
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    # maximum resident set size is reported in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        peak *= 1024
+    return peak
+
+
+def format_memory(peak):
+    if peak is None:
+        return "peak memory not available"
+    return "{:.1f} MiB".format(peak / (1 << 20))
+
+
+def run_case(config):
+    """Function to run all trials of a benchmark case.
+
+    Should be run in a fresh process, so that the peak memory belongs to the case.
+
+    Args:
+        config (Dict[str, any]): simulation parameters (see `main.get_config`).
+
+    Returns:
+        Dict[str, any]: wall time, simulated steps, completed requests, their rates and peak memory in bytes
+            (None if not available), with merged profiler statistics if `PROFILE` is set.
+    """
+
+    tick = time()
+    results_list = run_experiment(config, verbose=False)
+    wall_time = time() - tick
+
+    steps = sum(len(result[2]) for result in results_list)  # one congestion entry per time step
+    requests = sum(len(result[0]) for result in results_list)
+    case = {"wall_time": wall_time,
+            "steps": steps,
+            "requests": requests,
+            "steps_per_second": steps / wall_time,
+            "requests_per_second": requests / wall_time,
+            "peak_memory": get_peak_memory()}
+    if config["PROFILE"]:
+        # profiler statistics are appended to the metrics of each trial
+        case["profile"] = merge_stats([result[5] for result in results_list])
+    return case
+
+
+def run_suite(configs, verbose=True):
+    """Function to run each benchmark case in its own process, one at a time.
+
+    Args:
+        configs (Dict[str, Dict[str, any]]): configuration of each case (see `gen_bench_configs`).
+        verbose (bool): if the results of each case are printed (default True).
+
+    Returns:
+        Dict[str, any]: code version, platform information and results of each case.
+    """
+
+    cases = {}
+    for i, (key, config) in enumerate(configs.items()):
+        with ProcessPoolExecutor(1) as executor:
+            cases[key] = executor.submit(run_case, config).result()
+        if verbose:
+            print("Finished case {} of {}: {} ({:.0f} steps/s, {:.2f} requests/s, {})".format(
+                i + 1, len(configs), key, cases[key]["steps_per_second"], cases[key]["requests_per_second"],
+                format_memory(cases[key]["peak_memory"])))
+
+    return {"code_version": get_code_version(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "cases": cases}
+
+
+def save_baseline(filename, results):
+    with open(filename, "w") as fh:
+        json.dump(results, fh, indent=2)
+
+
+def load_baseline(filename):
+    with open(filename) as fh:
+        return json.load(fh)
+
+
+def compare_baselines(results, baseline, tolerance=TOLERANCE):
+    """Function to compare the steps per second of each case with a previous baseline.
+
+    Args:
+        results (Dict[str, any]): results returned by `run_suite`.
+        baseline (Dict[str, any]): previous results (see `load_baseline`).
+        tolerance (float): relative change of steps per second reported as a change (default TOLERANCE).
+
+    Returns:
+        List[Tuple[str, float, float, float, str]]: case key, previous and current steps per second,
+            ratio of current to previous, and "faster", "slower" or "same", for cases in both results.
+    """
+
+    rows = []
+    for key, case in results["cases"].items():
+        if key not in baseline["cases"]:
+            continue
+        previous = baseline["cases"][key]["steps_per_second"]
+        current = case["steps_per_second"]
+        ratio = current / previous
+        if ratio > 1 + tolerance:
+            change = "faster"
+        elif ratio < 1 - tolerance:
+            change = "slower"
+        else:
+            change = "same"
+        rows.append((key, previous, current, ratio, change))
+    return rows
+
+
+def format_comparison(rows):
+    lines = ["{:<28}{:>14}{:>14}{:>8}".format("case", "before (/s)", "after (/s)", "ratio")]
+    for key, previous, current, ratio, change in rows:
+        lines.append("{:<28}{:>14.0f}{:>14.0f}{:>8.2f} {}".format(key, previous, current, ratio, change))
+    return "\n".join(lines)
+
+
+def run_benchmark(baseline_filename=BASELINE, output_filename=OUTPUT, base_config=None, tolerance=TOLERANCE):
+    """Function to run the benchmark suite, save the results and compare them with a previous baseline.
+
+    Args:
+        baseline_filename (str): previous results to compare with (skipped if None or the file does not exist).
+        output_filename (str): file to save results to, which may be used as the next baseline.
+        base_config (Dict[str, any]): values of parameters not set by the benchmark (default from `main.get_config`).
+        tolerance (float): relative change of steps per second reported as a change (default TOLERANCE).
+
+    Returns:
+        List[Tuple[str, float, float, float, str]]: comparison rows returned by `compare_baselines`
+            (empty if there is no baseline).
+    """
+
+    results = run_suite(gen_bench_configs(base_config=base_config))
+    save_baseline(output_filename, results)
+    print("Saved results to", output_filename)
+
+    if baseline_filename is None or not os.path.exists(baseline_filename):
+        return []
+    baseline = load_baseline(baseline_filename)
+    if baseline["code_version"] == results["code_version"]:
+        print("Baseline has the same code version")
+    rows = compare_baselines(results, baseline, tolerance)
+    print(format_comparison(rows))
+    return rows
+
+
+if __name__ == "__main__":
+    run_benchmark(BASELINE, OUTPUT)
@@ -0,0 +1,199 @@
+import argparse
+import json
+import os
+import sys
+from time import time
+
+from main import get_config, run_experiment, gen_trial_data, save_data, load_network
+from profiling import merge_stats, format_stats
+from sweep import SWEEP_GRID, CACHE_DIR, run_sweep, export_sweep
+from bench import BASELINE, OUTPUT, run_case, run_benchmark, format_memory
+
+
+def load_config(filename=None):
+    """Function to load simulation parameters from a config file.
+
+    The file holds a JSON object with values for any of the parameters in `main.get_config`;
+    parameters not in the file keep the values set in `main.py`.
+
+    Args:
+        filename (str): name of JSON config file (default None to use `main.py` values only).
+
+    Returns:
+        Dict[str, any]: simulation parameters.
+    """
+
+    config = get_config()
+    if filename is None:
+        return config
+
+    with open(filename) as fh:
+        overrides = json.load(fh)
+    for name in overrides:
+        if name not in config:
+            raise ValueError("Invalid config parameter " + name)
+    config.update(overrides)
+    return config
+
+
+def get_output_filename(config, output):
+    if output is None:
+        return "data_" + config["CONTINUOUS_SCHEME"] + "." + config["DATA_FORMAT"]
+    return output
+
+
+def set_profiling(config, args):
+    if args.profile:
+        config["PROFILE"] = True
+    if args.progress is not None:
+        config["PROFILE"] = True
+        config["PROGRESS_INTERVAL"] = args.progress
+
+
+def print_profile(config, results_list):
+    # profiler statistics are appended to the metrics of each trial
+    if config["PROFILE"]:
+        print(format_stats(merge_stats([result[5] for result in results_list])))
+
+
+def run_command(args):
+    config = load_config(args.config)
+    set_profiling(config, args)
+    if args.memory_report:
+        config["MEMORY_REPORT"] = True
+
+    tick = time()
+    results_list = run_experiment(config, args.processes, verbose=not args.quiet)
+    sim_time = time() - tick
+    print("Total simulation time: ", sim_time)
+    print("Average time per trial: ", sim_time / config["NUM_TRIALS"])
+    print_profile(config, results_list)
+
+    data = gen_trial_data(results_list)
+    filename = get_output_filename(config, args.output)
+    save_data(filename, data)
+    print("Saved data to", filename)
+
+    if args.plot is not None:
+        render_plots(config, data, args.plot)
+
+
+def sweep_command(args):
+    config = load_config(args.config)
+    if args.grid is None:
+        grid = SWEEP_GRID
+    else:
+        with open(args.grid) as fh:
+            grid = json.load(fh)
+
+    points = run_sweep(grid, config, cache_dir=args.cache_dir or CACHE_DIR, num_processes=args.processes)
+    if args.output_template is not None:
+        export_sweep(points, args.output_template, args.output_dir)
+
+
+def render_plots(config, data, output_dir):
+    """Function to render figures of a run to image files with a non-interactive backend.
+
+    Args:
+        config (Dict[str, any]): simulation parameters, used to load the network.
+        data (Dict[str, List]): data returned by `main.gen_data` (or loaded by `graphing/graph_utils.load_data`).
+        output_dir (str): directory for image files (created if it does not exist).
+    """
+
+    # matplotlib is only imported through plotting, when figures are requested
+    from plotting import get_layout, plot_network, plot_results, plot_usage_patterns
+
+    os.makedirs(output_dir, exist_ok=True)
+    # figures use the network the data was obtained on, rather than generating a new one
+    graph_arr, _ = load_network(dict(config, GENERATE_NEW_NET=False))
+    pos = get_layout(graph_arr, config["SIM_SEED"])
+    plot_network(graph_arr, pos, os.path.join(output_dir, "network.png"), headless=True)
+    plot_results(data, os.path.join(output_dir, "results.png"), headless=True)
+    plot_usage_patterns(graph_arr, pos, data, os.path.join(output_dir, "pattern_{}_{}.png"), headless=True)
+    print("Saved figures to", output_dir)
+
+
+def plot_command(args):
+    # data files are read the same way as the graphing scripts
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "graphing"))
+    from graph_utils import load_data
+
+    render_plots(load_config(args.config), load_data(args.data), args.output_dir)
+
+
+def bench_command(args):
+    config = load_config(args.config)
+    if args.suite:
+        run_benchmark(args.baseline, args.output, config)
+        return
+
+    if args.trials is not None:
+        config["NUM_TRIALS"] = args.trials
+    set_profiling(config, args)
+
+    case = run_case(config)
+    print("Trials: ", config["NUM_TRIALS"])
+    print("Total time: ", case["wall_time"])
+    print("Average time per trial: ", case["wall_time"] / config["NUM_TRIALS"])
+    print("Time steps per second: ", case["steps_per_second"])
+    print("Completed requests per second: ", case["requests_per_second"])
+    print("Peak memory: ", format_memory(case["peak_memory"]))
+    if config["PROFILE"]:
+        print(format_stats(case["profile"]))
+
+
+def add_profiling_arguments(parser):
+    parser.add_argument("--profile", action="store_true", help="print wall time of each phase of the simulation loop")
+    parser.add_argument("--progress", type=float, metavar="SECONDS",
+                        help="print steps per second and ETA of each trial every SECONDS (implies --profile)")
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description="Run quantum network simulations without a display.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run all trials of a configuration and save the data")
+    run_parser.add_argument("-c", "--config", help="JSON file with parameters of main.get_config to override")
+    run_parser.add_argument("-o", "--output", help="output data file, .npz or .json (default data_<scheme>.<DATA_FORMAT>)")
+    run_parser.add_argument("-p", "--processes", type=int, default=1,
+                            help="number of worker processes to run trials in parallel")
+    run_parser.add_argument("--plot", metavar="DIR", help="also render figures to image files in DIR")
+    run_parser.add_argument("-q", "--quiet", action="store_true", help="do not print progress of trials")
+    run_parser.add_argument("--memory-report", action="store_true",
+                            help="print traced memory and estimated size of each structure for each trial")
+    add_profiling_arguments(run_parser)
+    run_parser.set_defaults(func=run_command)
+
+    sweep_parser = subparsers.add_parser("sweep", help="run all points of a parameter grid that are not cached")
+    sweep_parser.add_argument("-c", "--config", help="JSON file with base parameters of main.get_config")
+    sweep_parser.add_argument("-g", "--grid", help="JSON file with values of each swept parameter "
+                                                   "(default sweep.SWEEP_GRID)")
+    sweep_parser.add_argument("--cache-dir", help="directory with cached results (default sweep.CACHE_DIR)")
+    sweep_parser.add_argument("-p", "--processes", type=int, help="number of points run in parallel")
+    sweep_parser.add_argument("--output-template", help="output filename template for each point")
+    sweep_parser.add_argument("--output-dir", default=".", help="directory for output files")
+    sweep_parser.set_defaults(func=sweep_command)
+
+    plot_parser = subparsers.add_parser("plot", help="render figures of a saved data file to image files")
+    plot_parser.add_argument("data", help="data file saved by run, .npz or .json")
+    plot_parser.add_argument("-c", "--config", help="JSON file with parameters the data was obtained with")
+    plot_parser.add_argument("-o", "--output-dir", default="figures", help="directory for image files")
+    plot_parser.set_defaults(func=plot_command)
+
+    bench_parser = subparsers.add_parser("bench", help="time the trials of a configuration, "
+                                                       "or run the benchmark suite of bench.py")
+    bench_parser.add_argument("-c", "--config", help="JSON file with parameters of main.get_config to override")
+    bench_parser.add_argument("-n", "--trials", type=int, help="number of trials (default NUM_TRIALS)")
+    bench_parser.add_argument("--suite", action="store_true",
+                              help="run all topology families, sizes, memory sizes and schemes of bench.py")
+    bench_parser.add_argument("--baseline", default=BASELINE, help="previous suite results to compare with")
+    bench_parser.add_argument("--output", default=OUTPUT, help="file to save suite results to")
+    add_profiling_arguments(bench_parser)
+    bench_parser.set_defaults(func=bench_command)
+
+    return parser
+
+
+if __name__ == "__main__":
+    args = get_parser().parse_args()
+    args.func(args)
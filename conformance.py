@@ -0,0 +1,263 @@
+import os
+import sys
+
+import numpy as np
+
+from main import get_config, run_experiment
+from sweep import gen_sweep_configs
+
+
+# conformance parameters
+CONFORMANCE_GRID = {"NET_TYPE": ["ring", "as_net"],
+                    "NET_SIZE": [16],
+                    "CONTINUOUS_SCHEME": ["adaptive", "uniform"],
+                    "SIM_SEED": [0, 1]}  # values for each parameter in main.get_config
+CONFORMANCE_END_TIME = 20000
+CONFORMANCE_TRIALS = 20
+CONFORMANCE_DIR = "conformance_networks"  # directory for generated network files
+
+# engines compared with the reference loop: parameters set for the engine, number of worker processes,
+# and if the engine claims results identical to the reference loop
+ENGINES = {"parallel": {"overrides": {}, "num_processes": None, "exact": True},
+           "event_driven": {"overrides": {"EVENT_DRIVEN": True}, "num_processes": 1, "exact": False},
+           "batch_generation": {"overrides": {"BATCH_GENERATION": True}, "num_processes": 1, "exact": False}}
+REFERENCE_OVERRIDES = {"EVENT_DRIVEN": False, "BATCH_GENERATION": False}
+
+# statistical checks, with trials as the unit of comparison (values within a trial are correlated)
+ALPHA = 0.01  # probability of failing any statistical check of a run for an equivalent engine
+STATISTICS = ("mean", "p50", "p95")  # statistics of each metric computed for every trial
+NUM_BOOTSTRAP = 2000  # number of bootstrap resamples of trials
+BOOTSTRAP_SEED = 0
+MIN_TOLERANCE = 0.02  # smallest relative difference of trial averages tolerated
+# tolerances are calibrated for each point by comparing the reference loop with itself on trials with other seeds
+
+
+def get_trial_statistics(results_list):
+    """Function to compute statistics of latencies, service times and congestion for every trial.
+
+    Args:
+        results_list (List[List]): metrics returned by `main.run_simulation` for each trial.
+
+    Returns:
+        Dict[Tuple[str, str], np.ndarray]: value of each (metric, statistic) for each trial
+            (NaN for trials without values).
+    """
+
+    statistics = {}
+    for metric, index in [("latencies", 0), ("service_times", 1), ("congestion", 2)]:
+        values = np.full((len(results_list), len(STATISTICS)), np.nan)
+        for trial, result in enumerate(results_list):
+            if len(result[index]) > 0:
+                trial_values = np.asarray(result[index], dtype=float)
+                values[trial] = [trial_values.mean(), np.percentile(trial_values, 50),
+                                 np.percentile(trial_values, 95)]
+        for i, statistic in enumerate(STATISTICS):
+            statistics[(metric, statistic)] = values[:, i]
+    return statistics
+
+
+def relative_difference(reference, values):
+    # metrics are counts of time steps or requests, so differences are relative to at least 1
+    return (values - reference) / np.maximum(np.abs(reference), 1.0)
+
+
+def bootstrap_interval(reference, values, confidence, rng):
+    """Function to compute a bootstrap confidence interval of the relative difference of trial averages.
+
+    Trials of each sample are resampled independently (percentile bootstrap).
+
+    Args:
+        reference (np.ndarray): statistic of each reference trial.
+        values (np.ndarray): statistic of each trial of the engine.
+        confidence (float): confidence level of the interval.
+        rng (Generator): random number generator for resampling.
+
+    Returns:
+        Tuple[float, float]: lower and upper bound of relative difference of averages.
+    """
+
+    reference_means = reference[rng.integers(len(reference), size=(NUM_BOOTSTRAP, len(reference)))].mean(axis=1)
+    means = values[rng.integers(len(values), size=(NUM_BOOTSTRAP, len(values)))].mean(axis=1)
+    differences = relative_difference(reference_means, means)
+    tail = 100 * (1 - confidence) / 2
+    lower, upper = np.percentile(differences, [tail, 100 - tail])
+    return float(lower), float(upper)
+
+
+def calibrate_tolerances(reference, calibration):
+    """Function to set tolerances from the difference between two sets of reference trials with different seeds.
+
+    Args:
+        reference (Dict[Tuple[str, str], np.ndarray]): trial statistics of the reference loop.
+        calibration (Dict[Tuple[str, str], np.ndarray]): trial statistics of the reference loop
+            on trials with other seeds.
+
+    Returns:
+        Dict[Tuple[str, str], float]: tolerated relative difference of trial averages for each (metric, statistic).
+    """
+
+    tolerances = {}
+    for key in reference:
+        reference_values = reference[key][~np.isnan(reference[key])]
+        calibration_values = calibration[key][~np.isnan(calibration[key])]
+        if len(reference_values) == 0 or len(calibration_values) == 0:
+            tolerances[key] = MIN_TOLERANCE
+            continue
+        noise = abs(relative_difference(reference_values.mean(), calibration_values.mean()))
+        tolerances[key] = max(float(noise), MIN_TOLERANCE)
+    return tolerances
+
+
+def compare_trials(reference, statistics, tolerances, confidence, rng):
+    """Function to check statistical equivalence of the trials of an engine with those of the reference loop.
+
+    A check fails only if the confidence interval of the relative difference of trial averages
+    lies entirely outside the tolerance, so that an equivalent engine fails a check with probability
+    at most 1 - confidence.
+
+    Args:
+        reference (Dict[Tuple[str, str], np.ndarray]): trial statistics of the reference loop.
+        statistics (Dict[Tuple[str, str], np.ndarray]): trial statistics of the engine.
+        tolerances (Dict[Tuple[str, str], float]): tolerated relative difference (see `calibrate_tolerances`).
+        confidence (float): confidence level of each interval.
+        rng (Generator): random number generator for resampling.
+
+    Returns:
+        List[Tuple[str, str, float, float, bool]]: metric, statistic, bound of the interval closest to zero,
+            tolerance and if the check passed.
+    """
+
+    checks = []
+    for (metric, statistic), reference_values in reference.items():
+        reference_values = reference_values[~np.isnan(reference_values)]
+        values = statistics[(metric, statistic)]
+        values = values[~np.isnan(values)]
+        tolerance = tolerances[(metric, statistic)]
+        if len(reference_values) < 2 or len(values) < 2:
+            # too few trials with values to compare, which is only equivalent if both engines have none
+            equal = len(reference_values) == len(values) == 0
+            checks.append((metric, statistic, 0.0 if equal else np.inf, tolerance, equal))
+            continue
+
+        lower, upper = bootstrap_interval(reference_values, values, confidence, rng)
+        closest = 0.0 if lower <= 0 <= upper else min(abs(lower), abs(upper))
+        checks.append((metric, statistic, closest, tolerance, closest <= tolerance))
+
+    return checks
+
+
+def results_equal(result1, result2):
+    """Function to check if two (nested) metrics are identical.
+
+    Args:
+        result1 (any): lists, dicts, arrays or numbers, as returned by `main.run_simulation`.
+        result2 (any): metrics to compare with.
+
+    Returns:
+        bool: if all elements are equal, including array shapes.
+    """
+
+    if isinstance(result1, np.ndarray) or isinstance(result2, np.ndarray):
+        return np.array_equal(result1, result2)
+    if isinstance(result1, dict):
+        return (isinstance(result2, dict) and result1.keys() == result2.keys()
+                and all(results_equal(result1[key], result2[key]) for key in result1))
+    if isinstance(result1, (list, tuple)):
+        return (isinstance(result2, (list, tuple)) and len(result1) == len(result2)
+                and all(results_equal(value1, value2) for value1, value2 in zip(result1, result2)))
+    return result1 == result2
+
+
+def gen_conformance_configs(grid=None, base_config=None):
+    """Function to generate the configuration of each point of the conformance grid.
+
+    Args:
+        grid (Dict[str, List]): values of each parameter to vary (default CONFORMANCE_GRID).
+        base_config (Dict[str, any]): values of all other parameters (default from `main.get_config`).
+
+    Returns:
+        List[Dict[str, any]]: configuration of each point, with networks and traffic generated from its seed.
+    """
+
+    if base_config is None:
+        base_config = get_config()
+    base_config = dict(base_config, GENERATE_NEW_NET=True, GENERATE_NEW_TRAFFIC=True, TRAFFIC_SCHEDULE=None,
+                       END_TIME=CONFORMANCE_END_TIME, NUM_TRIALS=CONFORMANCE_TRIALS,
+                       PROFILE=False, MEMORY_REPORT=False)
+    os.makedirs(CONFORMANCE_DIR, exist_ok=True)
+
+    configs = gen_sweep_configs(grid or CONFORMANCE_GRID, base_config)
+    for config in configs:
+        config["CONFIG"] = os.path.join(CONFORMANCE_DIR,
+                                        "net_{NET_TYPE}_{NET_SIZE}_{SIM_SEED}.json".format(**config))
+    return configs
+
+
+def run_conformance(engines=None, grid=None, base_config=None, verbose=True):
+    """Function to compare each engine with the reference loop on every point of the conformance grid.
+
+    Engines claiming identical results are compared element by element; all others are checked statistically.
+    The reference loop is run on twice the number of trials: the first half (with the same seeds as the engines)
+    is the reference, and the second half calibrates the tolerances.
+    The confidence of each interval is corrected for the number of checks (Bonferroni),
+    so that an equivalent engine fails any check of the run with probability at most ALPHA.
+
+    Args:
+        engines (Dict[str, Dict[str, any]]): engines to compare (default ENGINES).
+        grid (Dict[str, List]): values of each parameter to vary (default CONFORMANCE_GRID).
+        base_config (Dict[str, any]): values of all other parameters (default from `main.get_config`).
+        verbose (bool): if failed checks are printed (default True).
+
+    Returns:
+        List[Tuple[Dict[str, any], str, str, str, float, float, bool]]: point parameters, engine, metric, check,
+            value, threshold and if the check passed.
+    """
+
+    if engines is None:
+        engines = ENGINES
+    if grid is None:
+        grid = CONFORMANCE_GRID
+
+    configs = gen_conformance_configs(grid, base_config)
+    num_statistical = sum(not engine["exact"] for engine in engines.values())
+    num_checks = len(configs) * num_statistical * 3 * len(STATISTICS)
+    confidence = 1 - ALPHA / max(num_checks, 1)
+    rng = np.random.default_rng(BOOTSTRAP_SEED)
+
+    rows = []
+    for config in configs:
+        point = {name: config[name] for name in grid}
+        num_trials = config["NUM_TRIALS"]
+
+        # trials spawned from the same seed are identical for the first num_trials trials
+        all_reference_results = run_experiment(dict(config, NUM_TRIALS=2 * num_trials, **REFERENCE_OVERRIDES),
+                                               verbose=False)
+        reference_results = all_reference_results[:num_trials]
+        reference = get_trial_statistics(reference_results)
+        tolerances = calibrate_tolerances(reference, get_trial_statistics(all_reference_results[num_trials:]))
+
+        for name, engine in engines.items():
+            results = run_experiment(dict(config, **engine["overrides"]), engine["num_processes"], verbose=False)
+            if engine["exact"]:
+                equal = results_equal(reference_results, results)
+                checks = [("all", "identical", float(equal), 1.0, equal)]
+            else:
+                checks = compare_trials(reference, get_trial_statistics(results), tolerances, confidence, rng)
+
+            for check in checks:
+                rows.append((point,) + (name,) + check)
+                if verbose and not check[-1]:
+                    print("FAILED {} {}: {} {} = {:.4g} (threshold {:.4g})".format(name, point, *check[:-1]))
+
+        if verbose:
+            print("Finished point", point)
+
+    return rows
+
+
+if __name__ == "__main__":
+    rows = run_conformance()
+    num_failed = sum(not row[-1] for row in rows)
+    print("{} of {} checks passed".format(len(rows) - num_failed, len(rows)))
+    if num_failed > 0:
+        sys.exit(1)
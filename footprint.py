@@ -0,0 +1,153 @@
+import sys
+import tracemalloc
+
+import numpy as np
+
+
+NUM_TOP_ALLOCATIONS = 10  # number of source lines with the largest growth listed in memory reports
+
+
+def get_size(obj, seen=None):
+    """Function to estimate the memory used by an object and all objects it refers to.
+
+    Containers (lists, tuples, sets, dicts and object attributes) are followed recursively.
+    Each object is only counted once, so that objects shared between structures may be excluded
+    by passing the ids of objects already counted.
+    NumPy arrays count their data buffer, unless they are views of another array.
+
+    Args:
+        obj (any): object to measure.
+        seen (Set[int]): ids of objects already counted, updated in place (default None for an empty set).
+
+    Returns:
+        int: estimated number of bytes.
+    """
+
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        # includes the data buffer only if the array owns it
+        return sys.getsizeof(obj)
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(get_size(key, seen) + get_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(get_size(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += get_size(vars(obj), seen)
+    return size
+
+
+def estimate_sizes(topology, nodes, metrics=None):
+    """Function to estimate the memory used by each structure of a trial.
+
+    Structures shared between nodes are counted once, under the first structure that refers to them,
+    in the order of the returned dictionary.
+    Node objects themselves are excluded from the per-node structures.
+
+    Args:
+        topology (Topology): shared topology information for the network.
+        nodes (List[Node]): list of node objects for the network, indexed by label.
+        metrics (List): metrics returned by `main.run_simulation` (default None to skip metrics).
+
+    Returns:
+        Dict[str, int]: estimated number of bytes of each structure.
+    """
+
+    seen = {id(node) for node in nodes}
+    sizes = {"topology": get_size(topology, seen),
+             "link_counts": get_size(nodes[0].link_counts, seen),
+             "memory_pool": get_size(nodes[0].memory_pool, seen),
+             "other_nodes": sum(get_size(node.other_nodes, seen) for node in nodes),
+             "generation_protocols": sum(get_size(node.generation_protocol, seen) for node in nodes),
+             "neighbors_to_connect": sum(get_size(node.left_neighbors_to_connect, seen)
+                                         + get_size(node.right_neighbors_to_connect, seen) for node in nodes),
+             "node_rngs": sum(get_size(node.rng, seen) for node in nodes),
+             "nodes": sum(get_size(vars(node), seen) + sys.getsizeof(node) for node in nodes)}
+
+    if metrics is not None:
+        names = ["latencies", "service_times", "congestion", "request_complete_times", "entanglement_usage_pattern"]
+        for name, metric in zip(names, metrics):
+            sizes[name] = get_size(metric, seen)
+
+    return sizes
+
+
+class MemoryTracker:
+    """Class to take tracemalloc snapshots at the start and end of a trial.
+
+    Tracing is started by `start` if it is not already running, and only stopped by `stop` in that case.
+    Note that tracing slows down the simulation considerably.
+
+    Attributes:
+        started (bool): if tracing was started by this tracker.
+        start_snapshot (tracemalloc.Snapshot): snapshot taken by `start`.
+        start_memory (int): traced memory in bytes at `start`.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.start_snapshot = None
+        self.start_memory = 0
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started = True
+        tracemalloc.reset_peak()
+        self.start_snapshot = tracemalloc.take_snapshot()
+        self.start_memory = tracemalloc.get_traced_memory()[0]
+
+    def stop(self, num_top=NUM_TOP_ALLOCATIONS):
+        """Method to take the end snapshot and compare it with the start snapshot.
+
+        Args:
+            num_top (int): number of source lines with the largest growth to list (default NUM_TOP_ALLOCATIONS).
+
+        Returns:
+            Dict[str, any]: traced memory in bytes at start and end, peak traced memory during the trial,
+                and [source line, growth in bytes, growth in number of blocks] of the top source lines.
+        """
+
+        end_snapshot = tracemalloc.take_snapshot()
+        end_memory, peak_memory = tracemalloc.get_traced_memory()
+        if self.started:
+            tracemalloc.stop()
+            self.started = False
+
+        # exclude allocations of tracemalloc itself
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        differences = end_snapshot.filter_traces(filters).compare_to(
+            self.start_snapshot.filter_traces(filters), "lineno")
+        top = [[str(stat.traceback[0]), stat.size_diff, stat.count_diff] for stat in differences[:num_top]]
+
+        return {"start_memory": self.start_memory,
+                "end_memory": end_memory,
+                "peak_memory": peak_memory,
+                "top_allocations": top}
+
+
+def format_memory_report(report):
+    """Function to format a memory report of a trial.
+
+    Args:
+        report (Dict[str, any]): report returned by `MemoryTracker.stop`, with sizes from `estimate_sizes`.
+
+    Returns:
+        str: traced memory, estimated size of each structure and source lines with the largest growth.
+    """
+
+    mib = 1 << 20
+    lines = ["Traced memory: {:.2f} MiB at start, {:.2f} MiB at end, {:.2f} MiB peak".format(
+        report["start_memory"] / mib, report["end_memory"] / mib, report["peak_memory"] / mib)]
+    for name, size in sorted(report["sizes"].items(), key=lambda item: -item[1]):
+        lines.append("  {:<28}{:>12.3f} MiB".format(name, size / mib))
+    lines.append("Largest growth:")
+    for line, size_diff, count_diff in report["top_allocations"]:
+        lines.append("  {:+.3f} MiB ({:+d} blocks) {}".format(size_diff / mib, count_diff, line))
+    return "\n".join(lines)
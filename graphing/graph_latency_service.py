@@ -1,21 +1,15 @@
-import json
-import numpy as np
 from matplotlib import pyplot as plt
 
+from graph_utils import *
+
 filename = "data/parameter_explore/data_adaptive_large_memo_1.json"
-fh = open(filename)
-data = json.load(fh)
+data = load_data(filename)
 latencies = data["average_latencies"]
 service_times = data["average_service_times"]
-latencies_list = data["latencies"]
-service_times_list = data["service_times"]
 
 num_latencies = len(latencies)
-high_percentile_latencies = np.zeros(num_latencies)
-high_percentile_service = np.zeros(num_latencies)
-for i in range(num_latencies):
-    high_percentile_latencies[i] = np.percentile([ll[i] for ll in latencies_list], 95)
-    high_percentile_service[i] = np.percentile([sl[i] for sl in service_times_list], 95)
+_, (high_percentile_latencies,) = aggregate_trials(data["latencies"], (95,), num_latencies)
+_, (high_percentile_service,) = aggregate_trials(data["service_times"], (95,), num_latencies)
 
 fig, ax = plt.subplots(2, 1, figsize=(7, 5))
 
@@ -1,17 +1,122 @@
 import json
+import os
+import struct
+import sys
+import zipfile
 import numpy as np
 
+# aggregation is shared with the simulation in the parent directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from aggregation import aggregate_trials
+
+
+def load_columns(filename):
+    """Function to load columnar data saved by `main.save_data` as memory mapped arrays.
+
+    Members of the (uncompressed) .npz file are mapped in place, so that only the data accessed is read from disk.
+    Compressed members are loaded into memory.
+
+    Args:
+        filename (str): name of .npz file.
+
+    Returns:
+        Dict[str, np.ndarray]: array for each column.
+    """
+
+    columns = {}
+    with zipfile.ZipFile(filename) as zf, open(filename, "rb") as fh:
+        for info in zf.infolist():
+            name = info.filename[:-len(".npy")]
+            if info.compress_type != zipfile.ZIP_STORED:
+                columns[name] = np.load(zf.open(info))
+                continue
+
+            # skip local file header to the start of the .npy member
+            fh.seek(info.header_offset + 26)
+            name_len, extra_len = struct.unpack("<HH", fh.read(4))
+            fh.seek(info.header_offset + 30 + name_len + extra_len)
+            version = np.lib.format.read_magic(fh)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(fh)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(fh)
+
+            if np.prod(shape) == 0:
+                columns[name] = np.zeros(shape, dtype=dtype)
+            else:
+                columns[name] = np.memmap(filename, dtype=dtype, mode="r", offset=fh.tell(), shape=shape,
+                                          order="F" if fortran_order else "C")
+
+    return columns
+
+
+def get_rows(columns, name):
+    # split ragged column into rows using offsets
+    values = columns[name]
+    offsets = columns[name + "_offsets"]
+    return [values[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
+def find_data_file(filename):
+    """Function to find a data file saved in either format.
+
+    Args:
+        filename (str): name of data file, with or without a .npz or .json extension.
+
+    Returns:
+        str: the given name if the file exists, otherwise the name of the existing .npz or .json file.
+    """
+
+    if os.path.exists(filename):
+        return filename
+
+    base, extension = os.path.splitext(filename)
+    if extension not in (".npz", ".json"):
+        base = filename
+    for extension in (".npz", ".json"):
+        if os.path.exists(base + extension):
+            return base + extension
+    raise FileNotFoundError("No .npz or .json data file for " + filename)
+
+
+def load_data(filename):
+    """Function to load data saved by `main.save_data` in either format.
+
+    If the file does not exist, a file with the same name in the other format is loaded (see `find_data_file`),
+    so that scripts find existing data regardless of the format it was saved in.
+
+    Args:
+        filename (str): name of .npz or .json file.
+
+    Returns:
+        Dict[str, any]: averages (arrays) and per-trial series (lists of arrays) of latencies and service times,
+            and accumulated usage patterns for each request.
+    """
+
+    filename = find_data_file(filename)
+    if filename.endswith(".npz"):
+        columns = load_columns(filename)
+        return {"average_latencies": columns["average_latencies"],
+                "average_service_times": columns["average_service_times"],
+                "latencies": get_rows(columns, "latencies"),
+                "service_times": get_rows(columns, "service_times"),
+                "accumulated_available_patterns": get_rows(columns, "accumulated_available_patterns"),
+                "accumulated_ondemand_patterns": get_rows(columns, "accumulated_ondemand_patterns")}
 
-def get_data(filename):
     fh = open(filename)
     data = json.load(fh)
-    latencies = data["average_latencies"]
-    latencies_list = data["latencies"]
+    return {"average_latencies": np.array(data["average_latencies"]),
+            "average_service_times": np.array(data["average_service_times"]),
+            "latencies": data["latencies"],
+            "service_times": data["service_times"],
+            "accumulated_available_patterns": data["accumulated_available_patterns"],
+            "accumulated_ondemand_patterns": data["accumulated_ondemand_patterns"]}
 
-    num_latencies = len(latencies)
-    high_percentile = np.zeros(num_latencies)
-    for i in range(num_latencies):
-        high_percentile[i] = np.percentile([ll[i] for ll in latencies_list], 95)
+
+def get_data(filename):
+    data = load_data(filename)
+    latencies = data["average_latencies"]
+    _, (high_percentile,) = aggregate_trials(data["latencies"], (95,), len(latencies))
 
     return latencies, high_percentile
 
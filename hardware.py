@@ -1,29 +1,39 @@
+import heapq
 from math import inf
+import numpy as np
 from numpy.random import default_rng
-from networkx import Graph, shortest_path
 from protocols import *
 
 
 class Node:
     """Class of network nodes.
 
-    Hold quantum memories, information of total network topology (global variable) and nearest neighbor entanglement.
+    Hold quantum memories, information of total network topology (shared Topology object) and nearest neighbor entanglement.
     Carry continuous entanglement generation, adaptive update, and path finding protocols.
+    Quantum memories are stored in a MemoryPool shared by the network, and are referred to by local index.
 
     Attributes:
         label (int): integer to label the node, corresponding to the indices of traffic matrix and requests
         other_nodes (List[Node]): list of other node objects
+        nodes (List[Node]): shared list of all node objects in the network, indexed by label
         memo_size (int): number of quantum memories in the node, assuming memories are of the same type
-        memories (List[Memory]): local memory objects.
         lifetime (int): quantum memory lifetime in unit of simulation time step, represents time to store entanglement
-        entanglement_link_nums (Dict[int, int]): keeps track of numbers of entanglement links with direct neighbors (for path finding alg.)
-        _next_avail_memory (int): index (in self.memories) of next memory that may be reserved.
+        memory_pool (MemoryPool): shared memory arrays for the network
+        reserved (np.ndarray): view of memory_pool for local memories, if each memory has been reserved
+        partner_nodes (np.ndarray): view of memory_pool for local memories, label of entangled node (-1 if none)
+        partner_memories (np.ndarray): view of memory_pool for local memories, index of entangled memory (-1 if none)
+        expire_times (np.ndarray): view of memory_pool for local memories, expiration time of entanglement (-1 if none)
+        entangled_memories (Dict[int, int]): bitmap of local memories entangled with each other node (bit i set if
+            memory i is entangled), shared with memory_pool
+        link_counts (LinkCounts): shared numbers of entanglement links between all pairs of nodes in the network
+        entanglement_link_nums (np.ndarray): row of link_counts for this node, indexed by label of other node (for path finding alg.)
         left_neighbors_to_connect (List[List]): list of left neighbors' indices in route for entanglement connection
         right_neighbors_to_connect (List[List]): list of right neighbors' indices in route for entanglement connection
         generation_protocol (GenerationProtocol): entanglement generation protocol attached to the node
+        topology (Topology): shared topology information for the network (adjacency, hop distances and next hops)
     """
 
-    def __init__(self, label, memo_size, lifetime, gen_success_prob, swap_success_prob, network, seed=0):
+    def __init__(self, label, memo_size, lifetime, gen_success_prob, swap_success_prob, topology, seed=0):
         """Constructor of a node instance.
 
         Args:
@@ -32,47 +42,77 @@ class Node:
             lifetime (int): quantum memory lifetime in unit of simulation time step, represents time to store entanglement
             gen_success_prob (float): success probability of entanglement generation between 0 and 1
             swap_success_prob (float): success probability of entanglement swapping between 0 and 1
+            topology (Topology): shared topology information for the network
             seed (int): seed for random number generators (default 0)
         """
 
         self.label = label
         self.other_nodes = []
+        self.nodes = []
         self.memo_size = memo_size
-        self.memories = []
-        self.entanglement_link_nums = {}
+        self.lifetime = lifetime
+        self.memory_pool = None
+        self.reserved = None
+        self.partner_nodes = None
+        self.partner_memories = None
+        self.expire_times = None
+        self.entangled_memories = None
+        self.link_counts = None
+        self.entanglement_link_nums = None
         self.left_neighbors_to_connect = []
         self.right_neighbors_to_connect = []
 
         self.generation_protocol = None
-
-        self._next_avail_memory = 0
-
-        # create memories
-        for i in range(memo_size):
-            memory = Memory("Node" + str(self.label) + "[%d]" % i, lifetime)
-            memory.set_owner(self)
-            self.memories.append(memory)
+        self.topology = topology
 
         # create rng and store params
         self.rng = default_rng(seed)
         self.gen_success_prob = gen_success_prob
         self.swap_success_prob = swap_success_prob
-
-        self.network = network
-        self.graph = Graph(network)
+        self._success_probs = {}  # cache of generation success probability for each distance
 
     def set_other_nodes(self, nodes):
         self.other_nodes = nodes
-        self.entanglement_link_nums = {n.label: 0 for n in nodes}
+
+    def set_nodes(self, nodes):
+        self.nodes = nodes
+
+    def set_link_counts(self, link_counts):
+        self.link_counts = link_counts
+        self.entanglement_link_nums = link_counts.counts[self.label]
+
+    def set_memory_pool(self, memory_pool):
+        self.memory_pool = memory_pool
+        local = memory_pool.view(self.label)
+        self.reserved = memory_pool.reserved[local]
+        self.partner_nodes = memory_pool.partner_nodes[local]
+        self.partner_memories = memory_pool.partner_memories[local]
+        self.expire_times = memory_pool.expire_times[local]
+        self.entangled_memories = memory_pool.entangled_memories[self.label]
+
+    def get_entangled_memory(self, other_label):
+        """Method to find a local memory entangled with another node.
+
+        Args:
+            other_label (int): label of entangled node.
+
+        Returns:
+            int: lowest index of memory entangled with the other node (None if there is no entanglement).
+        """
+
+        mask = self.entangled_memories.get(other_label, 0)
+        if mask == 0:
+            return None
+        return (mask & -mask).bit_length() - 1
 
     def set_generation_protocol(self, protocol_type, adapt_param):
         if protocol_type == "adaptive":
-            neighbors = [j for j, element in enumerate(self.network[self.label]) if element != 0]
+            neighbors = self.topology.neighbors(self.label)
             self.generation_protocol = AdaptiveGenerationProtocol(self, adapt_param, neighbors)
         elif protocol_type == "powerlaw":
-            self.generation_protocol = PowerLawGenerationProtocol(self, self.network)
+            self.generation_protocol = PowerLawGenerationProtocol(self, self.topology)
         elif protocol_type == "uniform":
-            self.generation_protocol = UniformGenerationProtocol(self, self.network)
+            self.generation_protocol = UniformGenerationProtocol(self, self.topology)
         else:
             raise ValueError("Invalid generation type " + protocol_type)
 
@@ -80,54 +120,61 @@ class Node:
         """Method for entanglement generation and swapping protocol to invoke to reserve quantum memories.
 
         Returns:
-            Memory: memory object reserved (None if there are no free memories).
+            int: index of memory reserved (None if there are no free memories).
         """
 
-        if self._next_avail_memory >= self.memo_size:
-            return None
-        memory = self.memories[self._next_avail_memory]
-        memory.reserved = True
-
-        self._next_avail_memory += 1
-        while self._next_avail_memory < self.memo_size:
-            if not self.memories[self._next_avail_memory].reserved:
-                break
-            self._next_avail_memory += 1
-
-        return memory
+        return self.memory_pool.reserve(self.label)
 
     def memo_free(self, memory):
         """Method to free an occupied memory.
 
         Args:
-            memory (Memory): memory object to free.
+            memory (int): index of memory to free.
         """
 
-        idx = self.memories.index(memory)
-        memory.free()
-        if idx < self._next_avail_memory:
-            self._next_avail_memory = idx
+        self.memory_pool.free(self.label, memory)
 
     def memo_expire(self, memory):
-        # avoid infinite loop
+        """Method to expire the entanglement of a memory, freeing both entangled memories.
+
+        Args:
+            memory (int): index of memory to expire (ignored if None or not reserved).
+        """
+
         if memory is None:
-            return 
-        if not memory.reserved:
+            return
+        if not self.reserved[memory]:
             return
 
-        other_node = memory.entangled_memory["node"]
-        other_memory = memory.entangled_memory["memo"]
+        other_label = int(self.partner_nodes[memory])
+        other_memory = int(self.partner_memories[memory])
 
-        self.entanglement_link_nums[other_node.label] -= 1
-        memory.expire()
+        # link counts are shared, so the other node is updated as well
+        self.link_counts.add(self.label, other_label, -1)
+        self.memory_pool.expire(self.label, memory)
         self.memo_free(memory)
+        self.memory_pool.expire(other_label, other_memory)
+        self.memory_pool.free(other_label, other_memory)
+
+    def get_success_prob(self, other_label):
+        """Method to get the success probability of a single entanglement generation attempt with another node.
+
+        Args:
+            other_label (int): label of node to generate entanglement with.
+
+        Returns:
+            float: success probability, decreasing with distance to the other node.
+        """
 
-        other_node.memo_expire(other_memory)
+        distance = self.topology.distance(self.label, other_label)
+        if distance not in self._success_probs:
+            self._success_probs[distance] = (self.gen_success_prob ** distance) * \
+                                            (self.swap_success_prob ** (distance - 1))
+        return self._success_probs[distance]
 
     def create_random_link(self, time):
         label = self.generation_protocol.choose_link()
-        other_node = next((n for n in self.other_nodes if n.label == label), None)
-        self.create_link(time, other_node)
+        self.create_link(time, self.nodes[label])
 
     def create_link(self, time, other_node):
         """Method to create an entanglement link with another node.
@@ -143,11 +190,24 @@ class Node:
         """
 
         # check if entanglement succeeds
-        distance = len(shortest_path(self.graph, self.label, other_node.label)) - 1
-        success_prob = (self.gen_success_prob ** distance) * (self.swap_success_prob ** (distance - 1))
-        if self.rng.random() > success_prob:
+        if self.rng.random() > self.get_success_prob(other_node.label):
             return False
 
+        return self.build_link(time, other_node)
+
+    def build_link(self, time, other_node):
+        """Method to establish an entanglement link after a successful generation attempt.
+
+        If no memory is available on either node, will return False.
+
+        Args:
+            time (int): time of link creation (from main simulation loop).
+            other_node (Node): node to generate entanglement with.
+
+        Returns:
+            bool: if memories could be reserved for the link (True) or not (False).
+        """
+
         # reserve a local memory and a memory on the other node to entangle
         # Note: it is possible that when generating entanglement on demand, no memory is available for reservation
         local_memo = self.memo_reserve()
@@ -159,12 +219,10 @@ class Node:
             return False
 
         # entangle the two nodes
-        local_memo.entangle(other_memo, time)
+        self.memory_pool.entangle(self.label, local_memo, other_node.label, other_memo, time)
 
-        # record entanglement
-        self.entanglement_link_nums[other_node.label] += 1
-        # the other node should also update its entanglement link information
-        other_node.entanglement_link_nums[self.label] += 1
+        # record entanglement (for both nodes)
+        self.link_counts.add(self.label, other_node.label)
 
         return True
 
@@ -184,12 +242,12 @@ class Node:
         local_memo = self.memo_reserve()
         if local_memo is None:
             memo_id = self.rng.integers(self.memo_size)
-            self.memo_expire(self.memories[memo_id])
+            self.memo_expire(memo_id)
             local_memo = self.memo_reserve()
         other_memo = other_node.memo_reserve()
         if other_memo is None:
             memo_id = other_node.rng.integers(other_node.memo_size)
-            other_node.memo_expire(other_node.memories[memo_id])
+            other_node.memo_expire(memo_id)
             other_memo = other_node.memo_reserve()
 
         if self.rng.random() > self.gen_success_prob:
@@ -198,12 +256,10 @@ class Node:
             return
 
         # entangle the two nodes
-        local_memo.entangle(other_memo, time)
+        self.memory_pool.entangle(self.label, local_memo, other_node.label, other_memo, time)
 
-        # record entanglement
-        self.entanglement_link_nums[other_node.label] += 1
-        # the other node should also update its entanglement link information
-        other_node.entanglement_link_nums[self.label] += 1
+        # record entanglement (for both nodes)
+        self.link_counts.add(self.label, other_node.label)
 
     def swap(self, memory1, memory2):
         """Method to do entanglement swapping.
@@ -213,95 +269,271 @@ class Node:
         Does not modify start_time, and expiration of entanglement is determined by the first memory expiration
 
         Return the result of swapping (successful or not).
+
+        Args:
+            memory1 (int): index of local memory entangled with one node.
+            memory2 (int): index of local memory entangled with another node.
         """
 
-        assert memory1 in self.memories and memory2 in self.memories
+        assert 0 <= memory1 < self.memo_size and 0 <= memory2 < self.memo_size
 
-        if not memory1.reserved or not memory2.reserved:
+        if not self.reserved[memory1] or not self.reserved[memory2]:
             return
 
-        memo1 = memory1.entangled_memory["memo"]
-        memo2 = memory2.entangled_memory["memo"]
-        node1 = memory1.entangled_memory["node"]
-        node2 = memory2.entangled_memory["node"]
+        memo1 = int(self.partner_memories[memory1])
+        memo2 = int(self.partner_memories[memory2])
+        node1 = int(self.partner_nodes[memory1])
+        node2 = int(self.partner_nodes[memory2])
 
         if self.rng.random() < self.swap_success_prob:
             # reset local entanglement
-            memory1.expire()
-            memory2.expire()
+            self.memory_pool.expire(self.label, memory1)
+            self.memory_pool.expire(self.label, memory2)
             self.memo_free(memory1)
             self.memo_free(memory2)
-            self.entanglement_link_nums[node1.label] -= 1
-            self.entanglement_link_nums[node2.label] -= 1
+            self.link_counts.add(self.label, node1, -1)
+            self.link_counts.add(self.label, node2, -1)
 
             # entanglement connection, maintain same expiration time
-            memo1.entangled_memory["node"] = node2
-            memo2.entangled_memory["node"] = node1
-            memo1.entangled_memory["memo"] = memo2
-            memo2.entangled_memory["memo"] = memo1
+            self.memory_pool.connect(node1, memo1, node2, memo2)
 
             # update entanglement count
-            node1.entanglement_link_nums[self.label] -= 1
-            node2.entanglement_link_nums[self.label] -= 1
-            node1.entanglement_link_nums[node2.label] += 1
-            node2.entanglement_link_nums[node1.label] += 1
+            self.link_counts.add(node1, node2)
 
             return True
 
         else:
             # if unsuccessful, all involved memories entanglement reset
-            node1.memo_expire(memo1)
-            node2.memo_expire(memo2)
+            self.memo_expire(memory1)
+            self.memo_expire(memory2)
             return False
 
 
-class Memory:
-    """Simplified class of quantum memories to be stored in a node.
+class MemoryPool:
+    """Class of quantum memories for all nodes of a network, stored as arrays.
 
-    Omitting details of memory efficiency, quantum state fidelity, photon wavelength, memory maximal frequency of reuse, etc.
+    Simplified quantum memories, omitting details of memory efficiency, quantum state fidelity,
+    photon wavelength, memory maximal frequency of reuse, etc.
+    Memories of each node occupy a contiguous range of slots, and are referred to by (node label, local index).
+    No objects are allocated as memories are reserved, entangled, swapped or expire.
 
     Attributes:
-        name (str): name of a memory array instance
-        owner (Node): node object which holds this memory.
-        lifetime (int): quantum memory lifetime in unit of simulation time step, represents time to store quantum entanglement
-        reserved (bool): indicates if the memory has been reserved by the owning node.
-        entangled_memory (Dict[str, any]): records information on another memory sharing entanglement (if it exists).
+        offsets (np.ndarray): first slot of each node, followed by the total number of slots.
+        owners (np.ndarray): label of node holding the memory in each slot.
+        lifetimes (np.ndarray): quantum memory lifetime in unit of simulation time step for each slot.
+        reserved (np.ndarray): if the memory in each slot has been reserved by the owning node.
+        partner_nodes (np.ndarray): label of node holding the entangled memory (-1 if not entangled).
+        partner_memories (np.ndarray): local index of the entangled memory on its node (-1 if not entangled).
+        expire_times (np.ndarray): expiration time of entanglement (-1 if not entangled).
+        allocation (str): policy to choose the memory to reserve, "lowest" (free memory with lowest index)
+            or "stack" (most recently freed memory).
+        free_masks (List[int]): bitmap of free memories for each node (bit i set if memory i is free), for "lowest".
+        free_lists (List[List[int]]): stack of free memories for each node, for "stack".
+        entangled_memories (List[Dict[int, int]]): for each node, bitmap of memories entangled with each other node.
+        expiration_index (ExpirationIndex): index of expiration times of entangled memories.
     """
 
-    def __init__(self, name, lifetime):
-        """Constructor of memory instance.
+    def __init__(self, nodes, allocation="lowest"):
+        """Constructor of memory pool instance.
+
+        Both allocation policies reserve and free memories in constant time.
+        The "lowest" policy reproduces results of the original memory reservation.
 
         Args:
-            name (str): name of memory instance
-            lifetime (int): quantum memory lifetime in unit of simulation time step, represents time to store quantum entanglement
+            nodes (List[Node]): list of node objects for the network, indexed by label.
+            allocation (str): policy to choose the memory to reserve, "lowest" or "stack" (default "lowest").
         """
 
-        self.name = name
-        self.owner = None
-        self.lifetime = lifetime
-        self.reserved = False  # Boolean representing if the memory has been reserved for use
+        memo_sizes = [int(node.memo_size) for node in nodes]
+        self.offsets = np.concatenate(([0], np.cumsum(memo_sizes))).astype(int)
+        self.owners = np.repeat(np.arange(len(nodes)), memo_sizes)
+        self.lifetimes = np.repeat([node.lifetime for node in nodes], memo_sizes)
 
-        self.entangled_memory = {"node": None, "memo": None, "expire_time": None}
+        size = self.offsets[-1]
+        self.reserved = np.zeros(size, dtype=bool)
+        self.partner_nodes = np.full(size, -1, dtype=int)
+        self.partner_memories = np.full(size, -1, dtype=int)
+        self.expire_times = np.full(size, -1, dtype=np.int64)
 
-    def entangle(self, memory, time):
-        self.entangled_memory = {"node": memory.owner, "memo": memory, "expire_time": time + self.lifetime}
-        # the other memory should also update its entanglement information
-        memory.entangled_memory = {"node": self.owner, "memo": self, "expire_time": time + memory.lifetime}
+        if allocation not in ("lowest", "stack"):
+            raise ValueError("Invalid memory allocation policy " + allocation)
+        self.allocation = allocation
+        self.free_masks = [(1 << memo_size) - 1 for memo_size in memo_sizes]
+        self.free_lists = [list(reversed(range(memo_size))) for memo_size in memo_sizes]
+        self.entangled_memories = [{} for _ in nodes]
 
-    def set_owner(self, node):
-        self.owner = node
+        self.expiration_index = ExpirationIndex(self.expire_times)
 
-    def reserve(self):
-        if not self.reserved:
-            self.reserved = True
-        else:
-            raise Exception("This memory has already been reserved")
+    def view(self, label):
+        return slice(self.offsets[label], self.offsets[label + 1])
+
+    def slot(self, label, memory):
+        return self.offsets[label] + memory
+
+    def locate(self, slot):
+        label = int(self.owners[slot])
+        return label, int(slot - self.offsets[label])
+
+    def reserve(self, label):
+        """Method to reserve a free memory on a node, according to the allocation policy.
+
+        Args:
+            label (int): label of node to reserve memory on.
+
+        Returns:
+            int: local index of memory reserved (None if there are no free memories).
+        """
 
-    def free(self):
-        if self.reserved:
-            self.reserved = False
+        mask = self.free_masks[label]
+        if mask == 0:
+            return None
+        if self.allocation == "lowest":
+            # isolate lowest set bit
+            memory = (mask & -mask).bit_length() - 1
         else:
+            memory = self.free_lists[label].pop()
+
+        self.free_masks[label] = mask & ~(1 << memory)
+        self.reserved[self.slot(label, memory)] = True
+        return memory
+
+    def free(self, label, memory):
+        slot = self.slot(label, memory)
+        if not self.reserved[slot]:
             raise Exception("This memory is not reserved")
+        self.reserved[slot] = False
+        self.free_masks[label] |= 1 << int(memory)
+        if self.allocation == "stack":
+            self.free_lists[label].append(int(memory))
+
+    def entangle(self, label1, memory1, label2, memory2, time):
+        """Method to record entanglement between two memories.
+
+        Expiration time of each memory is determined by its own lifetime.
+
+        Args:
+            label1 (int): label of node holding first memory.
+            memory1 (int): local index of first memory.
+            label2 (int): label of node holding second memory.
+            memory2 (int): local index of second memory.
+            time (int): time of entanglement creation.
+        """
+
+        slot1 = self.slot(label1, memory1)
+        slot2 = self.slot(label2, memory2)
+        self.connect(label1, memory1, label2, memory2)
+        self.expire_times[slot1] = time + self.lifetimes[slot1]
+        self.expire_times[slot2] = time + self.lifetimes[slot2]
+
+        # record new expiration times
+        self.expiration_index.push(slot1)
+        self.expiration_index.push(slot2)
+
+    def connect(self, label1, memory1, label2, memory2):
+        """Method to set two memories as entangled with each other, without modifying expiration times.
+
+        Memories previously entangled with other nodes (e.g. before swapping) are retargeted.
+        """
+
+        self._set_partner(label1, memory1, label2, memory2)
+        self._set_partner(label2, memory2, label1, memory1)
+
+    def expire(self, label, memory):
+        self._set_partner(label, memory, -1, -1)
+        self.expire_times[self.slot(label, memory)] = -1
+
+    def _set_partner(self, label, memory, partner_label, partner_memory):
+        slot = self.slot(label, memory)
+        entangled_memories = self.entangled_memories[label]
+        bit = 1 << int(memory)
+
+        # remove from index of previous partner
+        previous_label = int(self.partner_nodes[slot])
+        if previous_label >= 0:
+            mask = entangled_memories[previous_label] & ~bit
+            if mask == 0:
+                del entangled_memories[previous_label]
+            else:
+                entangled_memories[previous_label] = mask
+
+        self.partner_nodes[slot] = partner_label
+        self.partner_memories[slot] = partner_memory
+        if partner_label >= 0:
+            entangled_memories[partner_label] = entangled_memories.get(partner_label, 0) | bit
+
+
+class LinkCounts:
+    """Class to keep track of numbers of entanglement links between all pairs of nodes in a network.
+
+    Counts are stored in a single symmetric matrix shared by all nodes, and should only be modified with `add`.
+
+    Attributes:
+        counts (np.ndarray): N x N array of numbers of entanglement links, indexed by node labels.
+    """
+
+    def __init__(self, size):
+        """Constructor of link counts instance.
+
+        Args:
+            size (int): number of nodes in the network.
+        """
+
+        self.counts = np.zeros((size, size), dtype=int)
+
+    def add(self, label1, label2, num=1):
+        self.counts[label1, label2] += num
+        self.counts[label2, label1] += num
+
+
+class ExpirationIndex:
+    """Class to keep track of memory expiration times across a network.
+
+    Memory slots are kept in a min-heap keyed by expiration time, so that only memories that actually expire are visited.
+    Entries are not removed when entanglement is reset (by MemoryPool.expire) or retargeted (by Node.swap);
+    instead, they are invalidated lazily by comparing with the current expiration time of the memory.
+
+    Attributes:
+        expire_times (np.ndarray): current expiration time of each memory slot (-1 if not entangled).
+        heap (List[Tuple[int, int]]): heap of (expiration time, memory slot) entries.
+    """
+
+    def __init__(self, expire_times):
+        self.expire_times = expire_times
+        self.heap = []
+
+    def push(self, slot):
+        heapq.heappush(self.heap, (int(self.expire_times[slot]), int(slot)))
+
+    def _is_valid(self, entry):
+        return self.expire_times[entry[1]] == entry[0]
+
+    def next_time(self):
+        """Method to get the earliest expiration time of entangled memories.
+
+        Returns:
+            float: earliest expiration time (inf if no memory is entangled).
+        """
+
+        while len(self.heap) > 0:
+            if self._is_valid(self.heap[0]):
+                return self.heap[0][0]
+            heapq.heappop(self.heap)
+        return inf
+
+    def pop_expired(self, time):
+        """Generator of memory slots expiring no later than a given time.
+
+        Validity is checked as each slot is yielded, so that the caller may expire memories
+        (and their entangled partners) while iterating.
+
+        Args:
+            time (int): current simulation time.
+
+        Yields:
+            int: slot of expired memory.
+        """
 
-    def expire(self):
-        self.entangled_memory = {"node": None, "memo": None, "expire_time": None}
+        while len(self.heap) > 0 and self.heap[0][0] <= time:
+            entry = heapq.heappop(self.heap)
+            if self._is_valid(entry):
+                yield entry[1]
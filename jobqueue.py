@@ -0,0 +1,291 @@
+import json
+import os
+import socket
+import sqlite3
+import sys
+from multiprocessing import Process
+from time import time, sleep
+
+from numpy.random import default_rng
+
+from main import get_config, load_network, load_traffic, gen_trial_inputs, run_trial, gen_trial_data
+from sweep import SWEEP_GRID, CACHE_DIR, get_code_version, get_config_key, gen_sweep_configs, save_point
+from topology import Topology
+
+
+# queue parameters
+QUEUE_DIR = "sweep_queue"  # shared directory with the queue database and trial results
+NUM_WORKERS = None  # number of local worker processes started by the coordinator (None for all cores)
+CLAIM_TIMEOUT = 24 * 3600  # seconds after which a running unit is assumed to be abandoned by a crashed worker
+MAX_ATTEMPTS = 3  # number of failed attempts before a unit is no longer claimed
+POLL_INTERVAL = 10  # seconds for coordinator to wait between status checks
+
+
+class JobQueue:
+    """Class representing a queue of simulation units, backed by an SQLite database in a shared directory.
+
+    Each unit is a single trial of a configuration, identified by the configuration's cache key and trial number.
+    Workers on any machine with access to the directory claim units, run them,
+    and write results atomically to the `results` subdirectory before marking the unit as done.
+    Units claimed by crashed workers are claimed again after a timeout, and running a unit twice is harmless,
+    so the queue may be resumed at any time without redoing finished units.
+    Note that SQLite relies on file locking, which must be supported by the shared file system.
+
+    Attributes:
+        queue_dir (str): directory with the database and results.
+        result_dir (str): directory with results for each unit.
+        db (sqlite3.Connection): connection to the queue database.
+    """
+
+    def __init__(self, queue_dir):
+        """Constructor of a job queue instance.
+
+        Args:
+            queue_dir (str): directory with the database and results (created if it does not exist).
+        """
+
+        self.queue_dir = queue_dir
+        self.result_dir = os.path.join(queue_dir, "results")
+        os.makedirs(self.result_dir, exist_ok=True)
+        # manage transactions explicitly, so that claims are atomic between workers
+        self.db = sqlite3.connect(os.path.join(queue_dir, "queue.db"), timeout=60, isolation_level=None)
+        self.db.execute("CREATE TABLE IF NOT EXISTS units ("
+                        "key TEXT, trial INTEGER, config TEXT, status TEXT DEFAULT 'pending', "
+                        "worker TEXT, claim_time REAL, attempts INTEGER DEFAULT 0, error TEXT, "
+                        "PRIMARY KEY (key, trial))")
+
+    def close(self):
+        self.db.close()
+
+    def submit(self, key, config):
+        """Method to add all trials of a configuration to the queue.
+
+        Units already in the queue are left unchanged.
+
+        Args:
+            key (str): cache key of the configuration.
+            config (Dict[str, any]): simulation parameters (see `main.get_config`).
+        """
+
+        encoded = json.dumps(config, sort_keys=True)
+        self.db.executemany("INSERT OR IGNORE INTO units (key, trial, config) VALUES (?, ?, ?)",
+                            [(key, trial, encoded) for trial in range(config["NUM_TRIALS"])])
+
+    def claim(self, worker, timeout=CLAIM_TIMEOUT):
+        """Method to claim a pending (or abandoned) unit.
+
+        Abandoned units that have reached the maximum number of attempts are marked as failed instead.
+
+        Args:
+            worker (str): identifier of the claiming worker.
+            timeout (float): seconds after which a running unit may be claimed again.
+
+        Returns:
+            Tuple[str, int, Dict[str, any]]: key, trial and configuration of the unit (None if no unit is available).
+        """
+
+        now = time()
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            # abandoned units without attempts left would otherwise remain running forever
+            self.db.execute("UPDATE units SET status = 'failed', error = 'claim timed out' "
+                            "WHERE status = 'running' AND claim_time < ? AND attempts >= ?",
+                            (now - timeout, MAX_ATTEMPTS))
+            row = self.db.execute("SELECT key, trial, config FROM units "
+                                  "WHERE (status = 'pending' OR (status = 'running' AND claim_time < ?)) "
+                                  "AND attempts < ? ORDER BY rowid LIMIT 1",
+                                  (now - timeout, MAX_ATTEMPTS)).fetchone()
+            if row is not None:
+                self.db.execute("UPDATE units SET status = 'running', worker = ?, claim_time = ?, "
+                                "attempts = attempts + 1 WHERE key = ? AND trial = ?",
+                                (worker, now, row[0], row[1]))
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+
+        if row is None:
+            return None
+        return row[0], row[1], json.loads(row[2])
+
+    def complete(self, key, trial, result):
+        """Method to store the result of a unit and mark it as done.
+
+        Args:
+            key (str): cache key of the configuration.
+            trial (int): trial number.
+            result (List): metrics returned by `main.run_trial`.
+        """
+
+        # write to a temporary file first, so that crashed workers never leave partial results
+        filename = self.get_result_filename(key, trial)
+        tmp_filename = "{}.{}.tmp".format(filename, os.getpid())
+        with open(tmp_filename, "w") as fh:
+            json.dump(result, fh, default=lambda value: value.tolist())
+        os.replace(tmp_filename, filename)
+        self.db.execute("UPDATE units SET status = 'done', error = NULL WHERE key = ? AND trial = ?", (key, trial))
+
+    def fail(self, key, trial, error):
+        # return unit to the queue, unless it has reached the maximum number of attempts
+        self.db.execute("UPDATE units SET status = CASE WHEN attempts < ? THEN 'pending' ELSE 'failed' END, "
+                        "error = ? WHERE key = ? AND trial = ?", (MAX_ATTEMPTS, error, key, trial))
+
+    def get_result_filename(self, key, trial):
+        return os.path.join(self.result_dir, "{}_{}.json".format(key, trial))
+
+    def get_status(self, key=None):
+        """Method to count units by status.
+
+        Args:
+            key (str): cache key of configuration to count (default None for all units).
+
+        Returns:
+            Dict[str, int]: number of units with each status.
+        """
+
+        if key is None:
+            rows = self.db.execute("SELECT status, COUNT(*) FROM units GROUP BY status")
+        else:
+            rows = self.db.execute("SELECT status, COUNT(*) FROM units WHERE key = ? GROUP BY status", (key,))
+        return dict(rows.fetchall())
+
+    def load_results(self, key, num_trials):
+        """Method to load the results of all trials of a configuration.
+
+        Args:
+            key (str): cache key of the configuration.
+            num_trials (int): number of trials.
+
+        Returns:
+            List[List]: metrics of each trial, in trial order (None if any trial is not done).
+        """
+
+        if self.get_status(key).get("done", 0) < num_trials:
+            return None
+
+        results_list = []
+        for trial in range(num_trials):
+            with open(self.get_result_filename(key, trial)) as fh:
+                results_list.append(json.load(fh))
+        return results_list
+
+
+def run_unit(config, trial):
+    """Function to run a single trial of a configuration independently of other trials.
+
+    Inputs of all trials are generated in order as in `main.run_trials`, so that results are identical.
+
+    Args:
+        config (Dict[str, any]): simulation parameters (see `main.get_config`).
+        trial (int): trial number.
+
+    Returns:
+        List: metrics returned by `main.run_trial`.
+    """
+
+    rng = default_rng(config["SIM_SEED"])
+    graph_arr, memo_sizes = load_network(config)
+    traffic_mtx = load_traffic(config, rng)
+    node_seeds_list, request_rngs = gen_trial_inputs(config, traffic_mtx, rng)
+    return run_trial(Topology(graph_arr), memo_sizes, traffic_mtx, node_seeds_list[trial], request_rngs[trial], config)
+
+
+def run_worker(queue_dir=QUEUE_DIR, worker=None):
+    """Function to run units from the queue until none are available.
+
+    Args:
+        queue_dir (str): directory with the queue database and results.
+        worker (str): identifier of the worker (default from host name and process id).
+    """
+
+    if worker is None:
+        worker = "{}:{}".format(socket.gethostname(), os.getpid())
+    queue = JobQueue(queue_dir)
+
+    while True:
+        unit = queue.claim(worker)
+        if unit is None:
+            break
+        key, trial, config = unit
+        try:
+            result = run_unit(config, trial)
+        except Exception as e:
+            queue.fail(key, trial, repr(e))
+            print("Worker {} failed trial {} of {}: {!r}".format(worker, trial, key, e))
+        else:
+            queue.complete(key, trial, result)
+
+    queue.close()
+
+
+def run_queue(grid, base_config=None, queue_dir=QUEUE_DIR, cache_dir=CACHE_DIR, num_workers=None):
+    """Function to coordinate a sweep through the job queue.
+
+    Submits all trials of the grid points that are not already cached, starts local workers,
+    and stores aggregated data of each point in the sweep cache (see `sweep.run_sweep`) once all its trials are done.
+    Workers on other machines may be started with `run_worker` on the same queue directory.
+    May be called again after interruption to resume the sweep.
+
+    Args:
+        grid (Dict[str, List]): values of each swept parameter.
+        base_config (Dict[str, any]): values of all other parameters (default from `main.get_config`).
+        queue_dir (str): directory with the queue database and trial results.
+        cache_dir (str): directory with cached results of each point.
+        num_workers (int): number of local worker processes (default None for all cores).
+
+    Returns:
+        List[Tuple[Dict[str, any], str]]: configuration and result filename of each point.
+    """
+
+    if base_config is None:
+        base_config = get_config()
+    if num_workers is None:
+        num_workers = os.cpu_count()
+    os.makedirs(cache_dir, exist_ok=True)
+
+    code_version = get_code_version()
+    configs = gen_sweep_configs(grid, base_config)
+    filenames = [os.path.join(cache_dir, get_config_key(config, code_version) + ".json") for config in configs]
+
+    queue = JobQueue(queue_dir)
+    missing = {}
+    for config, filename in zip(configs, filenames):
+        if not os.path.exists(filename):
+            key = os.path.splitext(os.path.basename(filename))[0]
+            missing[key] = (config, filename)
+            queue.submit(key, config)
+    print("Running {} of {} points".format(len(missing), len(configs)))
+
+    workers = [Process(target=run_worker, args=(queue_dir, None)) for _ in range(num_workers)]
+    for worker in workers:
+        worker.start()
+
+    # collect points as they finish; stop when all are collected or no unit may still finish
+    while len(missing) > 0:
+        for key, (config, filename) in list(missing.items()):
+            results_list = queue.load_results(key, config["NUM_TRIALS"])
+            if results_list is not None:
+                save_point(filename, config, code_version, gen_trial_data(results_list))
+                del missing[key]
+
+        status = queue.get_status()
+        print("Queue status: {}".format(status))
+        if len(missing) > 0:
+            if not any(worker.is_alive() for worker in workers) and status.get("pending", 0) == 0:
+                print("Stopping with {} unfinished points, run again to collect them".format(len(missing)))
+                break
+            sleep(POLL_INTERVAL)
+
+    for worker in workers:
+        worker.join()
+    queue.close()
+
+    return list(zip(configs, filenames))
+
+
+if __name__ == "__main__":
+    # run "python jobqueue.py worker" on other machines sharing QUEUE_DIR to add workers
+    if len(sys.argv) > 1 and sys.argv[1] == "worker":
+        run_worker(QUEUE_DIR)
+    else:
+        run_queue(SWEEP_GRID, queue_dir=QUEUE_DIR, cache_dir=CACHE_DIR, num_workers=NUM_WORKERS)
@@ -1,22 +1,34 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
+from itertools import islice, repeat
 from time import time
 
 import numpy as np
-from matplotlib import pyplot as plt
-import networkx as nx
+from numpy.random import SeedSequence
 
+from aggregation import pad_trials
+from footprint import MemoryTracker, estimate_sizes, format_memory_report
+from profiling import PhaseProfiler
 from simulation_core import *
 from hardware import *
 from protocols import *
+from scheduler import GenerationScheduler, BatchGenerator
+from topology import Topology
+from traces import load_trace, gen_trace_requests
 
 # Network parameters
 CONFIG = "network_customized.json"
 GENERATE_NEW_NET = False
 TRAFFIC_MATRIX = "traffic_matrix.json"
 GENERATE_NEW_TRAFFIC = False
+TRAFFIC_SCHEDULE = None  # JSON file with traffic matrix phases (see simulation_core.TrafficSchedule) to use instead
 RANDOM_REQUESTS = True
 NET_SIZE = 8
 NET_TYPE = "as_net"
 CONTINUOUS_SCHEME = "adaptive"
+EVENT_DRIVEN = False  # skip idle time steps by sampling successful background generation directly
+BATCH_GENERATION = False  # draw background generation of all nodes for each time step in array operations
 
 # Node parameters
 MEMO_SIZE = 5  # default memory number per node
@@ -24,17 +36,95 @@ MEMO_LIFETIME = 1000  # in units of simulation time step
 ENTANGLEMENT_GEN_PROB = 0.01
 ENTANGLEMENT_SWAP_PROB = 1
 ADAPT_WEIGHT = 0.05
+MEMO_ALLOCATION = "lowest"  # "lowest" reproduces original results, "stack" reuses most recently freed memory
 
 # Simulation parameters
 SIM_SEED = 0
 END_TIME = 40000
 NUM_TRIALS = 10
-QUEUE_LEN = 200
-QUEUE_INT = 200
+NUM_PROCESSES = 1  # number of worker processes to run trials in parallel (None to use all CPU cores)
+SEED_SCHEME = "spawn"  # "spawn" for independent per-trial seeds, "legacy" to reproduce original serial seeding
+PAIR_SAMPLING = "direct"  # "direct" samples request pairs from the traffic matrix, "legacy" reproduces original queues
+QUEUE_LEN = 200  # number of requests of each trial (None for no limit, requests are submitted until END_TIME)
+QUEUE_INT = 200  # mean interval between request submissions
+ARRIVALS = "constant"  # "constant", "random" or "poisson" intervals between request submissions
 QUEUE_START = QUEUE_INT
+TRACE = None  # trace file (see traces.py) to replay in every trial instead of generating requests
+DATA_FORMAT = "npz"  # "npz" for columnar arrays, "json" for nested lists
+PROFILE = False  # accumulate wall time of each phase of the simulation loop (see profiling.PhaseProfiler)
+PROGRESS_INTERVAL = None  # seconds between progress reports of each trial when profiling (None for no reports)
+MEMORY_REPORT = False  # trace memory of each trial and estimate the size of each structure (see footprint.py)
+
+
+def get_config():
+    """Function to collect the simulation parameters set at the top of this file.
+
+    Returns:
+        Dict[str, any]: parameters keyed by name, which may be modified to run other configurations.
+    """
+
+    return {"CONFIG": CONFIG,
+            "GENERATE_NEW_NET": GENERATE_NEW_NET,
+            "TRAFFIC_MATRIX": TRAFFIC_MATRIX,
+            "GENERATE_NEW_TRAFFIC": GENERATE_NEW_TRAFFIC,
+            "TRAFFIC_SCHEDULE": TRAFFIC_SCHEDULE,
+            "RANDOM_REQUESTS": RANDOM_REQUESTS,
+            "NET_SIZE": NET_SIZE,
+            "NET_TYPE": NET_TYPE,
+            "CONTINUOUS_SCHEME": CONTINUOUS_SCHEME,
+            "EVENT_DRIVEN": EVENT_DRIVEN,
+            "BATCH_GENERATION": BATCH_GENERATION,
+            "MEMO_SIZE": MEMO_SIZE,
+            "MEMO_LIFETIME": MEMO_LIFETIME,
+            "ENTANGLEMENT_GEN_PROB": ENTANGLEMENT_GEN_PROB,
+            "ENTANGLEMENT_SWAP_PROB": ENTANGLEMENT_SWAP_PROB,
+            "ADAPT_WEIGHT": ADAPT_WEIGHT,
+            "MEMO_ALLOCATION": MEMO_ALLOCATION,
+            "SIM_SEED": SIM_SEED,
+            "END_TIME": END_TIME,
+            "NUM_TRIALS": NUM_TRIALS,
+            "SEED_SCHEME": SEED_SCHEME,
+            "PAIR_SAMPLING": PAIR_SAMPLING,
+            "QUEUE_LEN": QUEUE_LEN,
+            "QUEUE_INT": QUEUE_INT,
+            "ARRIVALS": ARRIVALS,
+            "QUEUE_START": QUEUE_START,
+            "TRACE": TRACE,
+            "DATA_FORMAT": DATA_FORMAT,
+            "PROFILE": PROFILE,
+            "PROGRESS_INTERVAL": PROGRESS_INTERVAL,
+            "MEMORY_REPORT": MEMORY_REPORT}
+
+
+def run_simulation(topology, nodes, requests, end_time, event_driven=False, profiler=None, batch_generator=None):
+    """Main simulation loop.
+
+    By default, every node is run at every time step.
+    If event_driven is set, background entanglement generation of nodes not on the current route is sampled
+    by a GenerationScheduler, and time steps without any event (successful generation, memory expiration or
+    request submission) are skipped while no request is being served.
+    The event-driven loop produces statistically equivalent, but not identical, results.
+    If a batch generator is given, background generation of all nodes is instead drawn at once for every time step,
+    and successful attempts are applied in order of node label; results are also statistically equivalent.
+    Requests are consumed lazily from any iterable (e.g. `gen_requests`), so the number of requests is not bounded.
+    If a profiler is given, wall time and calls of each phase of the loop are accumulated
+    and its statistics are returned as an additional element of the metrics.
+
+    Args:
+        topology (Topology): hop distance and next hop tables for the network.
+        nodes (List[Node]): list of node objects for the network, indexed by label.
+        requests (Iterable[Request]): requests to submit, with strictly increasing submission times.
+        end_time (int): maximum number of time steps to simulate.
+        event_driven (bool): if the event-driven loop is used (default False).
+        profiler (PhaseProfiler): profiler for the phases of the loop (default None for no profiling).
+        batch_generator (BatchGenerator): generator for background generation of all nodes
+            (default None to run each node individually).
+
+    Returns:
+        List: latencies, service times, congestion, request completion times and entanglement usage pattern
+            (followed by profiler statistics if a profiler is given).
+    """
 
-
-def run_simulation(graph_arr, nodes, request_stack, end_time):
     time = 0
 
     # metrics
@@ -43,36 +133,58 @@ def run_simulation(graph_arr, nodes, request_stack, end_time):
     congestion = []  # keep track of number of incomplete requests at the end of each time step
     request_complete_times = []  # keep track of when each request is completed
     entanglement_usage_pattern = {"available": [], "ondemand": []}  # keep track of entanglement usage pattern for every request
+    # usage patterns are recorded as (K, 3) arrays of node label, other node label and number of entanglement links
 
-    requests_to_serve = []  # keep track of incomplete requests, in case new request comes in before previous request is completed
+    requests_to_serve = deque()  # keep track of incomplete requests, in case new request comes in before previous request is completed
     entanglement_available = []  # keep track of entanglement links from route nodes when a request is submitted
-    entanglement_ondemand = []  # keep track of entanglement links generated on demand to complete a request
+    entanglement_ondemand = np.zeros((len(nodes), len(nodes)), dtype=int)  # keep track of entanglement links generated on demand to complete a request
 
     # track current request and related info
-    next_request_to_submit = request_stack.pop(0)
+    # the request after the next one is looked ahead, to stop once the last request is the next to submit
+    request_source = iter(requests)
+    next_request_to_submit = next(request_source, None)
+    following_request = next(request_source, None)
     current_request = None
     origin_node = None
     destination_node = None
     route = []
 
+    # memories of all nodes are held by a shared pool, which indexes expiration times
+    memory_pool = nodes[0].memory_pool
+    expiration_index = memory_pool.expiration_index
+
+    if event_driven and batch_generator is not None:
+        raise ValueError("Batch generation is not supported by the event-driven loop")
+
+    scheduler = None
+    if event_driven:
+        scheduler = GenerationScheduler(nodes)
+        scheduler.set_route(route, time)
+
     while time < end_time:
         # check if memories expired
-        for node in nodes:
-            for memory in node.memories:
-                expire_time = memory.entangled_memory["expire_time"]
-                if expire_time is not None and expire_time <= time:
-                    node.memo_expire(memory)
+        if profiler is not None:
+            phase_start = profiler.start()
+        for slot in expiration_index.pop_expired(time):
+            label, memory = memory_pool.locate(slot)
+            nodes[label].memo_expire(memory)
+        if profiler is not None:
+            profiler.stop("expiry", phase_start)
 
         # determine if a new request is submitted to the network
-        if time == next_request_to_submit.submit_time:
+        if next_request_to_submit is not None and time == next_request_to_submit.submit_time:
+            if profiler is not None:
+                phase_start = profiler.start()
+
             # submit request
             requests_to_serve.append(next_request_to_submit)
 
             # find path and assign to route attribute
-            new_route = next_request_to_submit.get_path(graph_arr, nodes)
+            new_route = next_request_to_submit.get_path(topology, nodes)
             next_request_to_submit.route = new_route
 
             # assign as current request if there is none
+            previous_route = route
             if current_request is None:
                 current_request = next_request_to_submit
                 route = new_route
@@ -80,8 +192,9 @@ def run_simulation(graph_arr, nodes, request_stack, end_time):
                 destination_node = nodes[route[-1]]
 
             # get new request
-            if len(request_stack) > 0:
-                next_request_to_submit = request_stack.pop(0)
+            if following_request is not None:
+                next_request_to_submit = following_request
+                following_request = next(request_source, None)
 
             # update node information on other nodes in path
             # adaptively update probability distribution when a request is submitted to the network
@@ -93,19 +206,15 @@ def run_simulation(graph_arr, nodes, request_stack, end_time):
                 nodes[label].left_neighbors_to_connect.append(left_neighbors_to_connect)
                 nodes[label].right_neighbors_to_connect.append(right_neighbors_to_connect)
 
-                links_available = []
                 links_used = []
 
                 # get current links
-                for other_label, count in node.entanglement_link_nums.items():
-                    # determine if entanglement links are available
-                    if count > 0:
-                        links_available.append(other_label)
-                        # entanglement links available for nodes in the route for this request
-                        # avoid repetitive counting
-                        if other_label not in left_neighbors_to_connect:
-                            links = [(label, other_label)] * count
-                            entanglement_available.extend(links)
+                links_available = np.flatnonzero(node.entanglement_link_nums)
+                # entanglement links available for nodes in the route for this request
+                # avoid repetitive counting
+                others = links_available[~np.isin(links_available, left_neighbors_to_connect)]
+                entanglement_available.append(np.column_stack(
+                    (np.full(len(others), label), others, node.entanglement_link_nums[others])))
                 # get links used for request
                 if i > 0:
                     links_used.append(new_route[i-1])
@@ -114,17 +223,48 @@ def run_simulation(graph_arr, nodes, request_stack, end_time):
                 node.generation_protocol.update_dist(links_available, links_used)
 
             # record entanglement links available (stemming from nodes in route) and reset entanglement_available
-            entanglement_usage_pattern["available"].append(entanglement_available)
+            entanglement_usage_pattern["available"].append(np.concatenate(entanglement_available))
             entanglement_available = []
 
+            # reschedule background generation of nodes with updated probability distribution
+            if batch_generator is not None:
+                for label in new_route:
+                    batch_generator.update(label)
+            if scheduler is not None:
+                for label in new_route:
+                    if label not in previous_route:
+                        scheduler.schedule(label, time)
+                scheduler.set_route(route, time)
+
+            if profiler is not None:
+                profiler.stop("submission", phase_start)
+
+        # draw background generation of all nodes, only successful attempts are applied below
+        if batch_generator is not None:
+            if profiler is not None:
+                phase_start = profiler.start()
+            generated_links = batch_generator.draw()
+            if profiler is not None:
+                profiler.stop("generation", phase_start)
+
         # call function to run node (entanglement generation) protocol
         for node in nodes:
             n = node.label
+            if profiler is not None:
+                phase_start = profiler.start()
 
             if n not in route:
-                node.create_random_link(time)
+                phase = "generation"
+                if batch_generator is not None:
+                    if n in generated_links:
+                        node.build_link(time, nodes[generated_links[n]])
+                elif scheduler is None:
+                    node.create_random_link(time)
+                elif scheduler.is_due(n, time):
+                    scheduler.create_link(n, time)
 
             else:
+                phase = "ondemand"
                 # get neighbor information in the path
                 direct_right = None
                 direct_right_node = None
@@ -141,288 +281,562 @@ def run_simulation(graph_arr, nodes, request_stack, end_time):
 
                 # determine if the node is the origin node of the route
                 if node is origin_node:
-                    right_entanglement_link_nums = [node.entanglement_link_nums[i] for i in right_neighbors]
+                    right_entanglement_link_nums = node.entanglement_link_nums[right_neighbors]
                     # if no entanglement link with right neighbors, create link with direct right neighbor on demand
-                    if not any(right_entanglement_link_nums):
+                    if not right_entanglement_link_nums.any():
                         node.create_link_with_priority(time, direct_right_node)
-                        entanglement_ondemand.append((node.label, direct_right))
+                        entanglement_ondemand[node.label, direct_right] += 1
 
                 # determine if the node is the destination node of the route
                 elif node is destination_node:
-                    left_entanglement_link_nums = [node.entanglement_link_nums[i] for i in left_neighbors]
+                    left_entanglement_link_nums = node.entanglement_link_nums[left_neighbors]
                     # if no entanglement link with left neighbors, create link with direct left neighbor on demand
-                    if not any(left_entanglement_link_nums):
+                    if not left_entanglement_link_nums.any():
                         node.create_link_with_priority(time, direct_left_node)
-                        entanglement_ondemand.append((direct_left, node.label))
+                        entanglement_ondemand[direct_left, node.label] += 1
 
                 # otherwise the node is in the middle of the route
                 else:
-                    left_entanglement_link_nums = [node.entanglement_link_nums[i] for i in left_neighbors]
-                    right_entanglement_link_nums = [node.entanglement_link_nums[i] for i in right_neighbors]
+                    left_entanglement_link_nums = node.entanglement_link_nums[left_neighbors]
+                    right_entanglement_link_nums = node.entanglement_link_nums[right_neighbors]
 
                     # if no entanglement link with left neighbors, create link with direct left neighbor on demand
-                    if not any(left_entanglement_link_nums):
+                    if not left_entanglement_link_nums.any():
                         node.create_link_with_priority(time, direct_left_node)
-                        entanglement_ondemand.append((direct_left, node.label))
+                        entanglement_ondemand[direct_left, node.label] += 1
 
                     # if no entanglement link with right neighbors, create link with direct right neighbor on demand
-                    elif not any(right_entanglement_link_nums):
+                    elif not right_entanglement_link_nums.any():
                         node.create_link_with_priority(time, direct_right_node)
-                        entanglement_ondemand.append((node.label, direct_right))
+                        entanglement_ondemand[node.label, direct_right] += 1
 
                     # if both sides have entanglement links, try swapping
                     else:
                         # choose memories with rightmost and leftmost entanglement
                         # find leftmost and rightmost entangled nodes
-                        right_reversed = list(reversed(right_neighbors))
-                        right_nums_reversed = list(reversed(right_entanglement_link_nums))
-                        leftmost = next((label for num, label in zip(left_entanglement_link_nums, left_neighbors)
-                                         if num > 0), n)
-                        rightmost = next((label for num, label in zip(right_nums_reversed, right_reversed)
-                                          if num > 0), n)
+                        leftmost = left_neighbors[np.flatnonzero(left_entanglement_link_nums)[0]]
+                        rightmost = right_neighbors[np.flatnonzero(right_entanglement_link_nums)[-1]]
                         assert leftmost != n
                         assert rightmost != n
 
-                        leftmost_node = nodes[leftmost]
-                        rightmost_node = nodes[rightmost]
-
-                        left_memory = next((mem for mem in node.memories
-                                            if mem.entangled_memory["node"] == leftmost_node), None)
-                        right_memory = next((mem for mem in node.memories
-                                             if mem.entangled_memory["node"] == rightmost_node), None)
+                        left_memory = node.get_entangled_memory(leftmost)
+                        right_memory = node.get_entangled_memory(rightmost)
 
                         node.swap(left_memory, right_memory)
+                        phase = "swapping"
+
+            if profiler is not None:
+                profiler.stop(phase, phase_start)
 
         # determine if the desired entanglement is established
         if current_request is not None:
-            for memory in origin_node.memories:
-                # check if we have memory entangled with destination
-                if memory.entangled_memory["node"] == destination_node:
-                    # record latency and completion time
-                    latency = int(time - current_request.submit_time)
-                    serve_time = int(time - current_request.start_time)
-                    latencies.append(latency)
-                    serve_times.append(serve_time)
-                    request_complete_times.append(time)
-                    # record entanglement links generated on demand and reset entanglement_ondemand
-                    entanglement_usage_pattern["ondemand"].append(entanglement_ondemand)
-                    entanglement_ondemand = []
-
-                    # clean left and right neighbors_to_connect information for nodes in current route
-                    for node_label in route:
-                        nodes[node_label].left_neighbors_to_connect.pop(0)
-                        nodes[node_label].right_neighbors_to_connect.pop(0)
-                    # expire memories
-                    origin_node.memo_expire(memory)
-
-                    requests_to_serve.pop(0)
-                    # if waiting on any requests to serve, they will start at next time step
-                    if len(requests_to_serve) > 0:
-                        current_request = requests_to_serve[0]
-                        current_request.start_time = time + 1
-                        route = current_request.route
-                        origin_node = nodes[route[0]]
-                        destination_node = nodes[route[-1]]
-                    else:
-                        current_request = None
-                        route = []
-                        origin_node = None
-                        destination_node = None
+            if profiler is not None:
+                phase_start = profiler.start()
+
+            # check if we have memory entangled with destination
+            memory = origin_node.get_entangled_memory(destination_node.label)
+            if memory is not None:
+                # record latency and completion time
+                latency = int(time - current_request.submit_time)
+                serve_time = int(time - current_request.start_time)
+                latencies.append(latency)
+                serve_times.append(serve_time)
+                request_complete_times.append(time)
+                # record entanglement links generated on demand and reset entanglement_ondemand
+                rows, cols = np.nonzero(entanglement_ondemand)
+                entanglement_usage_pattern["ondemand"].append(
+                    np.column_stack((rows, cols, entanglement_ondemand[rows, cols])))
+                entanglement_ondemand[rows, cols] = 0
+
+                # clean left and right neighbors_to_connect information for nodes in current route
+                for node_label in route:
+                    nodes[node_label].left_neighbors_to_connect.pop(0)
+                    nodes[node_label].right_neighbors_to_connect.pop(0)
+                # expire memories
+                origin_node.memo_expire(memory)
+
+                requests_to_serve.popleft()
+                # if waiting on any requests to serve, they will start at next time step
+                if len(requests_to_serve) > 0:
+                    current_request = requests_to_serve[0]
+                    current_request.start_time = time + 1
+                    route = current_request.route
+                    origin_node = nodes[route[0]]
+                    destination_node = nodes[route[-1]]
+                else:
+                    current_request = None
+                    route = []
+                    origin_node = None
+                    destination_node = None
+
+                if scheduler is not None:
+                    scheduler.set_route(route, time + 1)
 
-                    break
+            if profiler is not None:
+                profiler.stop("completion", phase_start)
 
         congestion.append(len(requests_to_serve))
+        if profiler is not None:
+            profiler.step(time)
 
         # check if no more requests
-        if len(request_stack) == 0 and len(requests_to_serve) == 0:
+        if following_request is None and len(requests_to_serve) == 0:
             break
 
-        time += 1
+        # skip to next event if no request is being served
+        if scheduler is not None and current_request is None:
+            next_time = min(scheduler.next_time(), expiration_index.next_time(), end_time)
+            if next_request_to_submit is not None and next_request_to_submit.submit_time > time:
+                next_time = min(next_time, next_request_to_submit.submit_time)
+            next_time = int(next_time)
+            congestion.extend([len(requests_to_serve)] * (next_time - time - 1))
+            time = next_time
+        else:
+            time += 1
 
     # average latencies (over time) and return
-    return [latencies, serve_times, congestion, request_complete_times, entanglement_usage_pattern]
+    metrics = [latencies, serve_times, congestion, request_complete_times, entanglement_usage_pattern]
+    if profiler is not None:
+        metrics.append(profiler.get_stats())
+    return metrics
 
 
-if __name__ == "__main__":
-    # Setup rng
-    rng = default_rng(SIM_SEED)
+def load_network(config):
+    """Function to load (or generate) the network topology and memory sizes.
 
-    # Generate network
-    default_memos = [MEMO_SIZE] * NET_SIZE
-    if GENERATE_NEW_NET:
-        graph_arr = gen_network_json(CONFIG, NET_SIZE, NET_TYPE, SIM_SEED)
+    Args:
+        config (Dict[str, any]): simulation parameters (see `get_config`).
+
+    Returns:
+        Tuple[np.ndarray, List[int]]: adjacency array for the network and number of memories for each node.
+    """
+
+    net_size = config["NET_SIZE"]
+    default_memos = [config["MEMO_SIZE"]] * net_size
+    if config["GENERATE_NEW_NET"]:
+        graph_arr = gen_network_json(config["CONFIG"], net_size, config["NET_TYPE"], config["SIM_SEED"])
         memo_sizes = default_memos
     else:
-        fh = open(CONFIG)
+        fh = open(config["CONFIG"])
         topo = json.load(fh)
         graph_arr = np.array(topo["array"])
         memo_sizes = np.array(topo.get("memo_sizes", default_memos))
-        assert graph_arr.shape == (NET_SIZE, NET_SIZE)
-        assert len(memo_sizes) == NET_SIZE
-    G = nx.Graph(graph_arr)
-    pos = nx.spring_layout(G)
-    nx.draw_networkx(G, pos)
-    plt.show()
+        assert graph_arr.shape == (net_size, net_size)
+        assert len(memo_sizes) == net_size
 
-    # Generate traffic matrix
-    if GENERATE_NEW_TRAFFIC:
-        traffic_mtx = gen_traffic_mtx(NET_SIZE, rng)
+    return graph_arr, memo_sizes
+
+
+def load_traffic(config, rng):
+    """Function to load (or generate) the traffic matrix, or load the traffic schedule if one is set.
+
+    Args:
+        config (Dict[str, any]): simulation parameters (see `get_config`).
+        rng (Generator): simulation random number generator.
+
+    Returns:
+        np.ndarray or TrafficSchedule: traffic matrix or schedule.
+    """
+
+    if config["TRAFFIC_SCHEDULE"] is not None:
+        traffic_mtx = load_traffic_schedule(config["TRAFFIC_SCHEDULE"])
+    elif config["GENERATE_NEW_TRAFFIC"]:
+        traffic_mtx = gen_traffic_mtx(config["NET_SIZE"], rng)
     else:
-        tm = open(TRAFFIC_MATRIX)
+        tm = open(config["TRAFFIC_MATRIX"])
         tm_json = json.load(tm)
         traffic_mtx = np.array(tm_json["matrix"])
 
-    latencies_list = []
-    serve_times_list = []
-    usage_pattern_list = []
+    return traffic_mtx
 
-    tick = time()
-    for trial in range(NUM_TRIALS):
-        # set nodes
-        seed_start = NET_SIZE * trial
-        nodes = [Node(i, memo_size, MEMO_LIFETIME, ENTANGLEMENT_GEN_PROB, ENTANGLEMENT_SWAP_PROB, graph_arr,
-                      seed=seed_start+i)
-                 for i, memo_size in enumerate(memo_sizes)]
-        for node in nodes:
-            other_nodes = nodes[:]
-            other_nodes.remove(node)
-            node.set_other_nodes(other_nodes)
-            node.set_generation_protocol(CONTINUOUS_SCHEME, ADAPT_WEIGHT)
-
-        # Generate request node pair queue
-        if RANDOM_REQUESTS:
-            pair_queue = gen_pair_queue(traffic_mtx, NET_SIZE, QUEUE_LEN, rng, rng)
+
+def create_nodes(topology, memo_sizes, node_seeds, config):
+    """Function to create and connect node objects for a single trial.
+
+    Args:
+        topology (Topology): shared topology information for the network.
+        memo_sizes (List[int]): number of quantum memories for each node.
+        node_seeds (List): seed (int or SeedSequence) for random number generator of each node.
+        config (Dict[str, any]): simulation parameters (see `get_config`).
+
+    Returns:
+        List[Node]: list of node objects, indexed by label.
+    """
+
+    nodes = [Node(i, memo_size, config["MEMO_LIFETIME"], config["ENTANGLEMENT_GEN_PROB"],
+                  config["ENTANGLEMENT_SWAP_PROB"], topology, seed=seed)
+             for i, (memo_size, seed) in enumerate(zip(memo_sizes, node_seeds))]
+    link_counts = LinkCounts(len(nodes))
+    memory_pool = MemoryPool(nodes, config["MEMO_ALLOCATION"])
+    for node in nodes:
+        other_nodes = nodes[:]
+        other_nodes.remove(node)
+        node.set_other_nodes(other_nodes)
+        node.set_nodes(nodes)  # labels are indices, so that other nodes are found without a search
+        node.set_link_counts(link_counts)
+        node.set_memory_pool(memory_pool)
+        node.set_generation_protocol(config["CONTINUOUS_SCHEME"], config["ADAPT_WEIGHT"])
+
+    return nodes
+
+
+def gen_trial_seeds(config, rng):
+    """Function to generate seeds for node random number generators and request generation of each trial.
+
+    With the "spawn" seed scheme, each trial gets independent child seeds from `SeedSequence.spawn`.
+    With the "legacy" scheme, nodes are seeded with consecutive integers and all trials share one request generator,
+    which reproduces the original serial seeding as long as requests are generated in trial order.
+
+    Args:
+        config (Dict[str, any]): simulation parameters (see `get_config`).
+        rng (Generator): simulation random number generator, shared by requests of all trials for "legacy" scheme.
+
+    Returns:
+        List[Tuple[List, Generator]]: node seeds and request random number generator for each trial.
+    """
+
+    num_trials = config["NUM_TRIALS"]
+    net_size = config["NET_SIZE"]
+    seed_scheme = config["SEED_SCHEME"]
+    if seed_scheme == "spawn":
+        trial_seeds = []
+        for trial_seq in SeedSequence(config["SIM_SEED"]).spawn(num_trials):
+            node_seq, request_seq = trial_seq.spawn(2)
+            trial_seeds.append((node_seq.spawn(net_size), default_rng(request_seq)))
+        return trial_seeds
+
+    elif seed_scheme == "legacy":
+        return [([net_size * trial + i for i in range(net_size)], rng) for trial in range(num_trials)]
+
+    else:
+        raise ValueError("Invalid seed scheme " + seed_scheme)
+
+
+def gen_trial_requests(config, traffic_mtx, request_rng):
+    """Function to create the requests of a trial lazily from its request random number generator.
+
+    With a limited `QUEUE_LEN`, all node pairs and then all submission times are drawn in one block each,
+    so that requests are identical to the queues generated up front by earlier versions.
+
+    Args:
+        config (Dict[str, any]): simulation parameters (see `get_config`).
+        traffic_mtx (np.ndarray or TrafficSchedule): traffic matrix or schedule.
+        request_rng (Generator): random number generator for request times and node pairs of the trial.
+
+    Returns:
+        Iterator[Request]: request source for `run_simulation`, with at most `QUEUE_LEN` requests.
+    """
+
+    queue_len = config["QUEUE_LEN"]
+    block_size = queue_len if queue_len is not None else 1024
+    request_times = gen_request_times(config["QUEUE_START"], config["ARRIVALS"], config["QUEUE_INT"], request_rng,
+                                      block_size)
+    if not config["RANDOM_REQUESTS"]:
+        return gen_requests(request_times, repeat((9, 6)), queue_len)  # a queue of identical requests
+
+    if isinstance(traffic_mtx, TrafficSchedule):
+        # pairs depend on times, so times are drawn first
+        return islice(gen_schedule_requests(traffic_mtx, request_times, request_rng, block_size), queue_len)
+
+    # pairs are drawn before times
+    pairs = gen_request_pairs(traffic_mtx, config["NET_SIZE"], request_rng, block_size, config["PAIR_SAMPLING"])
+    return (Request(t, pair) for pair, t in islice(zip(pairs, request_times), queue_len))
+
+
+def run_trial(topology, memo_sizes, traffic_mtx, node_seeds, request_rng, config):
+    """Function to run a single trial of the simulation.
+
+    Defined at module level so that trials may be run in worker processes.
+
+    Args:
+        topology (Topology): shared topology information for the network.
+        memo_sizes (List[int]): number of quantum memories for each node.
+        traffic_mtx (np.ndarray or TrafficSchedule): traffic matrix or schedule.
+        node_seeds (List): seed (int or SeedSequence) for random number generator of each node.
+        request_rng (Generator): random number generator for requests of the trial (unused if replaying a trace).
+        config (Dict[str, any]): simulation parameters (see `get_config`).
+
+    Returns:
+        List: metrics returned by `run_simulation`, followed by a memory report if `MEMORY_REPORT` is set.
+    """
+
+    tracker = None
+    if config["MEMORY_REPORT"]:
+        tracker = MemoryTracker()
+        tracker.start()
+
+    nodes = create_nodes(topology, memo_sizes, node_seeds, config)
+
+    # Requests are created as they are submitted
+    if config["TRACE"] is None:
+        requests = gen_trial_requests(config, traffic_mtx, request_rng)
+    else:
+        requests = gen_trace_requests(load_trace(config["TRACE"]), topology.size)
+
+    profiler = None
+    if config["PROFILE"]:
+        profiler = PhaseProfiler(config["END_TIME"], config["PROGRESS_INTERVAL"])
+
+    batch_generator = None
+    if config["BATCH_GENERATION"]:
+        # seeded from the node seeds, so that trials remain reproducible
+        batch_generator = BatchGenerator(nodes, [int(seed.generate_state(1)[0]) if isinstance(seed, SeedSequence)
+                                                 else int(seed) for seed in node_seeds])
+
+    metrics = run_simulation(topology, nodes, requests, config["END_TIME"], config["EVENT_DRIVEN"], profiler,
+                             batch_generator)
+
+    if tracker is not None:
+        report = tracker.stop()
+        report["sizes"] = estimate_sizes(topology, nodes, metrics)
+        metrics.append(report)
+
+    return metrics
+
+
+def gen_trial_inputs(config, traffic_mtx, rng):
+    """Function to generate node seeds and request random number generators of all trials.
+
+    Requests are only created by each trial (see `gen_trial_requests`), so that worker processes receive
+    generator states rather than request queues.
+    With the "legacy" seed scheme, all trials share one request generator: each trial gets a copy of its state,
+    which is then advanced past the requests of the trial, so that requests do not depend on how trials are executed.
+
+    Args:
+        config (Dict[str, any]): simulation parameters (see `get_config`).
+        traffic_mtx (np.ndarray or TrafficSchedule): traffic matrix or schedule.
+        rng (Generator): simulation random number generator.
+
+    Returns:
+        Tuple[List[List], List[Generator]]: node seeds and request random number generator of each trial.
+    """
+
+    shared = config["SEED_SCHEME"] == "legacy" and config["TRACE"] is None
+    if shared and config["QUEUE_LEN"] is None:
+        raise ValueError("Invalid QUEUE_LEN None for legacy seed scheme")
+
+    node_seeds_list = []
+    request_rngs = []
+    for node_seeds, request_rng in gen_trial_seeds(config, rng):
+        node_seeds_list.append(node_seeds)
+        if shared:
+            request_rngs.append(deepcopy(request_rng))
+            deque(gen_trial_requests(config, traffic_mtx, request_rng), maxlen=0)  # draw requests of the trial
         else:
-            pair_queue = [(9, 6) for i in range(QUEUE_LEN)]  # a queue of identical requests
-        # Generate request submission time list with constant interval
-        time_list = gen_request_time_list(QUEUE_START, QUEUE_LEN, interval=QUEUE_INT)
-        # Generate request stack
-        request_stack = [Request(time, pair) for time, pair in zip(time_list, pair_queue)]
-
-        # Run simulation
-        latencies, serve_times, congestion, request_complete_times, entanglement_usage_pattern =\
-            run_simulation(graph_arr, nodes, request_stack, END_TIME)
-        latencies_list.append(latencies)
-        serve_times_list.append(serve_times)
-        usage_pattern_list.append(entanglement_usage_pattern)
-        print("Finished trial {} of {}".format(trial + 1, NUM_TRIALS))
-    
-    sim_time = time() - tick
-    print("Total simulation time: ", sim_time)
-    print("Average time per trial: ", sim_time / NUM_TRIALS)
+            request_rngs.append(request_rng)
 
-    num_latencies = min([len(latencies_list[i]) for i in range(NUM_TRIALS)])
-    num_serve_times = min([len(serve_times_list[i]) for i in range(NUM_TRIALS)])
-    num_requests = min(num_latencies, num_serve_times)  # num_latencies and num_serve_times should be equal in principle
-    latencies_avg = np.zeros(num_requests)
-    serve_times_avg = np.zeros(num_requests)
+    return node_seeds_list, request_rngs
+
+
+def run_trials(config, topology, memo_sizes, traffic_mtx, rng, num_processes=1, verbose=True):
+    """Function to run all trials of a configuration.
+
+    Args:
+        config (Dict[str, any]): simulation parameters (see `get_config`).
+        topology (Topology): shared topology information for the network.
+        memo_sizes (List[int]): number of quantum memories for each node.
+        traffic_mtx (np.ndarray or TrafficSchedule): traffic matrix or schedule.
+        rng (Generator): simulation random number generator.
+        num_processes (int): number of worker processes to run trials in parallel (default 1, None for all cores).
+        verbose (bool): if progress is printed (default True), memory reports are printed if `MEMORY_REPORT` is set.
+
+    Returns:
+        List[List]: metrics returned by `run_simulation` for each trial, in trial order.
+    """
+
+    node_seeds_list, request_rngs = gen_trial_inputs(config, traffic_mtx, rng)
+    args = (repeat(topology), repeat(memo_sizes), repeat(traffic_mtx), node_seeds_list, request_rngs, repeat(config))
+    if num_processes == 1:
+        executor = None
+        results = map(run_trial, *args)
+    else:
+        executor = ProcessPoolExecutor(num_processes)
+        results = executor.map(run_trial, *args)
+
+    results_list = []
+    for trial, result in enumerate(results):
+        results_list.append(result)
+        if verbose:
+            print("Finished trial {} of {}".format(trial + 1, config["NUM_TRIALS"]))
+        if config["MEMORY_REPORT"]:
+            # reports are requested separately from progress, so they are printed even if not verbose
+            print("Memory report of trial {}:".format(trial + 1))
+            print(format_memory_report(result[-1]))
+
+    if executor is not None:
+        executor.shutdown()
+
+    return results_list
+
+
+def run_experiment(config, num_processes=1, verbose=True):
+    """Function to run all trials of a configuration, including loading the network and traffic matrix.
+
+    Args:
+        config (Dict[str, any]): simulation parameters (see `get_config`).
+        num_processes (int): number of worker processes to run trials in parallel (default 1, None for all cores).
+        verbose (bool): if progress is printed (default True).
+
+    Returns:
+        List[List]: metrics returned by `run_simulation` for each trial, in trial order.
+    """
+
+    rng = default_rng(config["SIM_SEED"])
+    graph_arr, memo_sizes = load_network(config)
+    traffic_mtx = load_traffic(config, rng)
+    return run_trials(config, Topology(graph_arr), memo_sizes, traffic_mtx, rng, num_processes, verbose)
 
-    for i in range(NUM_TRIALS):
-        latencies_avg += np.array(latencies_list[i][:num_requests])
 
-    for i in range(NUM_TRIALS):
-        serve_times_avg += np.array(serve_times_list[i][:num_requests])
+def accumulate_edge_counts(patterns):
+    """Function to sum the entanglement link counts of several usage patterns.
 
-    latencies_avg = latencies_avg / NUM_TRIALS
-    serve_times_avg = serve_times_avg / NUM_TRIALS
+    Args:
+        patterns (List[np.ndarray]): (K, 3) arrays of node label, other node label and number of links.
 
-    # construct error
-    low_percentile = np.zeros(num_latencies)
-    high_percentile = np.zeros(num_latencies)
-    low_percentile_serve = np.zeros(num_latencies)
-    high_percentile_serve = np.zeros(num_latencies)
-    for i in range(num_latencies):
-        low_percentile[i] = np.percentile([ll[i] for ll in latencies_list], 5)
-        high_percentile[i] = np.percentile([ll[i] for ll in latencies_list], 95)
-        low_percentile_serve[i] = np.percentile([ll[i] for ll in serve_times_list], 5)
-        high_percentile_serve[i] = np.percentile([ll[i] for ll in serve_times_list], 95)
+    Returns:
+        np.ndarray: (K, 3) array with a single row for each node pair, sorted by node pair.
+    """
+
+    pattern = np.concatenate([np.asarray(p, dtype=np.int64).reshape(-1, 3) for p in patterns])
+    pairs, inverse = np.unique(pattern[:, :2], axis=0, return_inverse=True)
+    counts = np.bincount(inverse.ravel(), weights=pattern[:, 2], minlength=len(pairs)).astype(np.int64)
+    return np.column_stack((pairs.reshape(-1, 2), counts))
+
+
+def gen_data(latencies_list, serve_times_list, usage_pattern_list):
+    """Function to aggregate metrics of all trials into the data saved for graphing.
+
+    Args:
+        latencies_list (List[List[int]]): request latencies for each trial.
+        serve_times_list (List[List[int]]): request service times for each trial.
+        usage_pattern_list (List[Dict[str, List]]): entanglement usage patterns for each trial.
+
+    Returns:
+        Dict[str, List]: latencies, service times, their averages over trials, and accumulated usage patterns
+            (lists of [node label, other node label, number of links] for each request).
+    """
+
+    num_trials = len(latencies_list)
+    num_latencies = min([len(latencies_list[i]) for i in range(num_trials)])
+    num_serve_times = min([len(serve_times_list[i]) for i in range(num_trials)])
+    num_requests = min(num_latencies, num_serve_times)  # num_latencies and num_serve_times should be equal in principle
+    latencies_avg = pad_trials(latencies_list, num_requests).mean(axis=0)
+    serve_times_avg = pad_trials(serve_times_list, num_requests).mean(axis=0)
 
     # entanglement usage pattern information
-    available_patterns = [usage_pattern_list[i]["available"] for i in range(NUM_TRIALS)]
-    ondemand_patterns = [usage_pattern_list[i]["ondemand"] for i in range(NUM_TRIALS)]
-    available_accum = [[] for i in range(num_requests)]
-    ondemand_accum = [[] for i in range(num_requests)]
+    available_patterns = [usage_pattern_list[i]["available"] for i in range(num_trials)]
+    ondemand_patterns = [usage_pattern_list[i]["ondemand"] for i in range(num_trials)]
+    available_accum = []
+    ondemand_accum = []
     for i in range(num_requests):
-        for pattern in available_patterns:
-            available_accum[i] += pattern[i]
-        for pattern in ondemand_patterns:
-            ondemand_accum[i] += pattern[i]
-
-    # choose the first, the last and the middle requests' patterns for visualization
-    vis_available_patterns = [available_accum[0], available_accum[round(num_requests/2)], available_accum[-1]]
-    vis_ondemand_patterns = [ondemand_accum[0], ondemand_accum[round(num_requests/2)], ondemand_accum[-1]]
-    vis_available_graphs = []
-    vis_ondemand_graphs = []
-    for pattern in vis_available_patterns:
-        G_vis = nx.Graph(graph_arr)
-        nx.set_edge_attributes(G_vis, 0, "available")
-        # nx.set_edge_attributes(G_vis, 0, "ondemand")
-        for pair in pattern:
-            if (pair[0], pair[1]) not in G_vis.edges():
-                G_vis.add_edge(pair[0], pair[1], available=1)
-            else:
-                G_vis[pair[0]][pair[1]]["available"] += 1
-        vis_available_graphs.append(G_vis)
-        
-    for pattern in vis_ondemand_patterns:
-        G_vis = nx.Graph(graph_arr)
-        # nx.set_edge_attributes(G_vis, 0, "available")
-        nx.set_edge_attributes(G_vis, 0, "ondemand")
-        for pair in pattern:
-            if (pair[0], pair[1]) not in G_vis.edges():
-                G_vis.add_edge(pair[0], pair[1], ondemand=1)
-            else:
-                G_vis[pair[0]][pair[1]]["ondemand"] += 1
-        vis_ondemand_graphs.append(G_vis)
+        available_accum.append(accumulate_edge_counts([pattern[i] for pattern in available_patterns]).tolist())
+        ondemand_accum.append(accumulate_edge_counts([pattern[i] for pattern in ondemand_patterns]).tolist())
 
-    # save data
-    filename = "data_" + CONTINUOUS_SCHEME + ".json"
-    data = {"latencies": latencies_list,
+    return {"latencies": latencies_list,
             "service_times": serve_times_list,
             "average_latencies": latencies_avg.tolist(),
             "average_service_times": serve_times_avg.tolist(),
             "accumulated_available_patterns": available_accum,
             "accumulated_ondemand_patterns": ondemand_accum}
-    fh = open(filename, 'w')
-    json.dump(data, fh)
-            
-    # statistics visualization
-    requests_latencies = np.arange(num_latencies)
-    requests_serve_times = np.arange(num_serve_times)
-
-    fig = plt.figure(figsize=(7, 7))
-
-    ax1 = plt.subplot(211)
-    ax1.plot(requests_latencies, latencies_avg)
-    ax1.set_title("average request latencies")
-    ax1.fill_between(requests_latencies, high_percentile, low_percentile, alpha=0.4)
-    
-    ax2 = plt.subplot(212)
-    ax2.plot(requests_serve_times, serve_times_avg)
-    ax2.set_title("average times to serve requests")
-    ax2.fill_between(requests_serve_times, high_percentile_serve, low_percentile_serve, alpha=0.4)
-
-    plt.xlabel("request number")
-    plt.tight_layout()
-    plt.show()
-
-    # patterns visualization on graphs
-    for Graph in vis_available_graphs:
-        edges = Graph.edges()
-        avails = [Graph[u][v]["available"] for u,v in edges]
-        nx.draw_networkx_nodes(Graph, pos)
-        nx.draw_networkx_labels(Graph, pos)
-        edges_drawn = nx.draw_networkx_edges(Graph, pos, edge_color=avails, width=2, edge_cmap=plt.cm.Greens, edge_vmin=0)
-        plt.colorbar(edges_drawn)
-        plt.axis('off')
-        plt.show()
-    
-    for Graph in vis_ondemand_graphs:
-        edges = Graph.edges()
-        ondemands = [Graph[u][v]["ondemand"] for u,v in edges]
-        nx.draw_networkx_nodes(Graph, pos)
-        nx.draw_networkx_labels(Graph, pos)
-        edges_drawn = nx.draw_networkx_edges(Graph, pos, edge_color=ondemands, width=2, edge_cmap=plt.cm.Reds, edge_vmin=0)
-        plt.colorbar(edges_drawn)
-        plt.axis('off')
-        plt.show()
+
+
+def gen_trial_data(results_list):
+    """Function to aggregate the metrics of all trials into the data saved for graphing.
+
+    Args:
+        results_list (List[List]): metrics returned by `run_simulation` for each trial (e.g. from `run_trials`).
+
+    Returns:
+        Dict[str, List]: data returned by `gen_data`.
+    """
+
+    latencies_list = [result[0] for result in results_list]
+    serve_times_list = [result[1] for result in results_list]
+    usage_pattern_list = [result[4] for result in results_list]
+    return gen_data(latencies_list, serve_times_list, usage_pattern_list)
+
+
+def gen_columns(data):
+    """Function to convert data into columnar arrays.
+
+    Ragged data (lists of varying length) are concatenated into a single array,
+    with an additional `<name>_offsets` array such that element i is `array[offsets[i]:offsets[i+1]]`.
+
+    Args:
+        data (Dict[str, List]): data returned by `gen_data`.
+
+    Returns:
+        Dict[str, np.ndarray]: fixed-dtype arrays for each column.
+    """
+
+    columns = {"average_latencies": np.array(data["average_latencies"], dtype=np.float64),
+               "average_service_times": np.array(data["average_service_times"], dtype=np.float64)}
+
+    for name in ["latencies", "service_times"]:
+        rows = data[name]
+        columns[name] = np.fromiter((value for row in rows for value in row), dtype=np.int64)
+        columns[name + "_offsets"] = np.concatenate(([0], np.cumsum([len(row) for row in rows]))).astype(np.int64)
+
+    for name in ["accumulated_available_patterns", "accumulated_ondemand_patterns"]:
+        rows = data[name]
+        counts = np.fromiter((value for row in rows for edge in row for value in edge), dtype=np.int64)
+        columns[name] = counts.reshape(-1, 3)
+        columns[name + "_offsets"] = np.concatenate(([0], np.cumsum([len(row) for row in rows]))).astype(np.int64)
+
+    return columns
+
+
+def save_data(filename, data):
+    """Function to save data for graphing.
+
+    Files ending in ".npz" hold uncompressed columnar arrays (see `gen_columns`), which may be memory mapped
+    by `graphing/graph_utils.load_columns`; other files hold the data as JSON.
+
+    Args:
+        filename (str): name of output file.
+        data (Dict[str, List]): data returned by `gen_data`.
+    """
+
+    if filename.endswith(".npz"):
+        np.savez(filename, **gen_columns(data))
+    else:
+        fh = open(filename, 'w')
+        json.dump(data, fh)
+
+
+if __name__ == "__main__":
+    # plotting is only imported here, see cli.py for running without a display
+    from plotting import get_layout, plot_network, plot_results, plot_usage_patterns
+
+    config = get_config()
+
+    # Setup rng
+    rng = default_rng(SIM_SEED)
+
+    # Generate network
+    graph_arr, memo_sizes = load_network(config)
+    topology = Topology(graph_arr)
+    pos = get_layout(graph_arr)
+    plot_network(graph_arr, pos)
+
+    # Generate traffic matrix
+    traffic_mtx = load_traffic(config, rng)
+
+    tick = time()
+
+    # Run simulation, results are merged in trial order
+    results_list = run_trials(config, topology, memo_sizes, traffic_mtx, rng, NUM_PROCESSES)
+
+    sim_time = time() - tick
+    print("Total simulation time: ", sim_time)
+    print("Average time per trial: ", sim_time / NUM_TRIALS)
+
+    data = gen_trial_data(results_list)
+
+    # save data
+    filename = "data_" + CONTINUOUS_SCHEME + "." + DATA_FORMAT
+    save_data(filename, data)
+
+    # statistics and patterns visualization
+    plot_results(data)
+    plot_usage_patterns(graph_arr, pos, data)
@@ -0,0 +1,170 @@
+import networkx as nx
+import numpy as np
+
+from aggregation import aggregate_trials
+
+
+def get_pyplot(headless=False):
+    """Function to import pyplot only when plotting is requested.
+
+    Args:
+        headless (bool): if the non-interactive Agg backend is used, for rendering to files (default False).
+
+    Returns:
+        module: matplotlib.pyplot.
+    """
+
+    import matplotlib
+    if headless:
+        matplotlib.use("Agg")
+    from matplotlib import pyplot as plt
+    return plt
+
+
+def finish_figure(plt, filename):
+    # show figure interactively if no filename is given
+    if filename is None:
+        plt.show()
+    else:
+        plt.savefig(filename, bbox_inches='tight')
+        plt.close()
+
+
+def get_edge_counts(pattern):
+    """Function to convert a usage pattern into rows of node label, other node label and number of links.
+
+    Data saved before usage patterns were recorded as edge counts hold a [node label, other node label] pair
+    for every link, which are counted.
+
+    Args:
+        pattern (List[List[int]]): rows of node label, other node label and number of links, or legacy pairs.
+
+    Returns:
+        np.ndarray: (K, 3) array of node label, other node label and number of links.
+    """
+
+    pattern = np.asarray(pattern, dtype=np.int64)
+    if pattern.size == 0:
+        return pattern.reshape(0, 3)
+    if pattern.ndim == 2 and pattern.shape[1] == 2:
+        pairs, counts = np.unique(pattern, axis=0, return_counts=True)
+        return np.column_stack((pairs, counts))
+    if pattern.ndim == 2 and pattern.shape[1] == 3:
+        return pattern
+    raise ValueError("Invalid usage pattern with shape {}".format(pattern.shape))
+
+
+def gen_usage_graph(graph_arr, pattern, attribute):
+    """Function to create a graph with the number of entanglement links of a usage pattern on each edge.
+
+    Args:
+        graph_arr (np.ndarray): adjacency array for the network.
+        pattern (List[List[int]]): rows of node label, other node label and number of links (see `get_edge_counts`).
+        attribute (str): name of edge attribute for the number of links.
+
+    Returns:
+        nx.Graph: network graph, with additional edges for links between nodes that are not adjacent.
+    """
+
+    pattern = get_edge_counts(pattern)
+    counts = np.zeros(graph_arr.shape, dtype=np.int64)
+    np.add.at(counts, (pattern[:, 0], pattern[:, 1]), pattern[:, 2])
+    counts = np.triu(counts + counts.T)  # links are undirected
+
+    G_vis = nx.Graph(graph_arr)
+    nx.set_edge_attributes(G_vis, 0, attribute)
+    for u, v in zip(*np.nonzero(counts)):
+        G_vis.add_edge(int(u), int(v), **{attribute: int(counts[u, v])})
+    return G_vis
+
+
+def get_layout(graph_arr, seed=None):
+    """Function to compute positions of nodes for drawing the network.
+
+    Args:
+        graph_arr (np.ndarray): adjacency array for the network.
+        seed (int): seed for the spring layout, so that figures of separate runs match (default None).
+
+    Returns:
+        Dict[int, np.ndarray]: position of each node.
+    """
+
+    return nx.spring_layout(nx.Graph(graph_arr), seed=seed)
+
+
+def plot_network(graph_arr, pos, filename=None, headless=False):
+    plt = get_pyplot(headless)
+    nx.draw_networkx(nx.Graph(graph_arr), pos)
+    finish_figure(plt, filename)
+
+
+def plot_results(data, filename=None, headless=False):
+    """Function to plot average request latencies and service times, with 5th to 95th percentile bands.
+
+    Args:
+        data (Dict[str, List]): data returned by `main.gen_data` (or loaded by `graphing/graph_utils.load_data`).
+        filename (str): output image file (default None to show interactively).
+        headless (bool): if the non-interactive Agg backend is used (default False).
+    """
+
+    plt = get_pyplot(headless)
+    latencies_avg = np.asarray(data["average_latencies"])
+    serve_times_avg = np.asarray(data["average_service_times"])
+    num_requests = len(latencies_avg)
+
+    # construct error
+    _, (low_percentile, high_percentile) = aggregate_trials(data["latencies"], (5, 95), num_requests)
+    _, (low_percentile_serve, high_percentile_serve) = aggregate_trials(data["service_times"], (5, 95), num_requests)
+
+    requests = np.arange(num_requests)
+
+    plt.figure(figsize=(7, 7))
+
+    ax1 = plt.subplot(211)
+    ax1.plot(requests, latencies_avg)
+    ax1.set_title("average request latencies")
+    ax1.fill_between(requests, high_percentile, low_percentile, alpha=0.4)
+
+    ax2 = plt.subplot(212)
+    ax2.plot(requests, serve_times_avg)
+    ax2.set_title("average times to serve requests")
+    ax2.fill_between(requests, high_percentile_serve, low_percentile_serve, alpha=0.4)
+
+    plt.xlabel("request number")
+    plt.tight_layout()
+    finish_figure(plt, filename)
+
+
+def plot_usage_patterns(graph_arr, pos, data, filename_template=None, headless=False):
+    """Function to plot accumulated entanglement usage patterns of the first, middle and last requests on the network.
+
+    Args:
+        graph_arr (np.ndarray): adjacency array for the network.
+        pos (Dict[int, np.ndarray]): positions of nodes.
+        data (Dict[str, List]): data returned by `main.gen_data` (or loaded by `graphing/graph_utils.load_data`).
+        filename_template (str): output image files, formatted with the pattern type ("available" or "ondemand")
+            and the request number (default None to show interactively).
+        headless (bool): if the non-interactive Agg backend is used (default False).
+    """
+
+    plt = get_pyplot(headless)
+    for attribute, cmap in [("available", plt.cm.Greens), ("ondemand", plt.cm.Reds)]:
+        accum = data["accumulated_" + attribute + "_patterns"]
+        num_requests = len(accum)
+        if num_requests == 0:
+            continue
+
+        # choose the first, the last and the middle requests' patterns for visualization
+        for request in [0, round(num_requests/2), num_requests - 1]:
+            Graph = gen_usage_graph(graph_arr, accum[request], attribute)
+            edges = Graph.edges()
+            counts = [Graph[u][v][attribute] for u, v in edges]
+            nx.draw_networkx_nodes(Graph, pos)
+            nx.draw_networkx_labels(Graph, pos)
+            edges_drawn = nx.draw_networkx_edges(Graph, pos, edge_color=counts, width=2, edge_cmap=cmap, edge_vmin=0)
+            plt.colorbar(edges_drawn)
+            plt.axis('off')
+            if filename_template is None:
+                finish_figure(plt, None)
+            else:
+                finish_figure(plt, filename_template.format(attribute, request))
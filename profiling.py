@@ -0,0 +1,138 @@
+from time import perf_counter
+
+
+# phases of the simulation loop timed by PhaseProfiler, in loop order
+PHASES = ["expiry", "submission", "generation", "ondemand", "swapping", "completion"]
+
+
+class PhaseProfiler:
+    """Class to accumulate wall time and call counts for each phase of the simulation loop.
+
+    Phases are:
+        expiry: popping and expiring memories past their lifetime.
+        submission: submitting a request, including path finding and `update_dist` of route nodes.
+        generation: background generation of a node not on the route (`create_random_link`).
+        ondemand: a route node checking its links and generating on demand (`create_link_with_priority`).
+        swapping: a route node swapping entanglement.
+        completion: checking if the current request is complete, and completing it.
+
+    The simulation loop only calls the profiler if one is given, so that profiling costs nothing when disabled.
+
+    Attributes:
+        end_time (int): maximum number of time steps of the simulation.
+        report_interval (float): seconds of wall time between progress reports (None for no reports).
+        times (Dict[str, float]): accumulated wall time of each phase.
+        calls (Dict[str, int]): number of calls of each phase.
+        iterations (int): number of iterations of the simulation loop.
+        sim_time (int): last simulated time step.
+        start_time (float): wall time at creation.
+        last_report (float): wall time of last progress report.
+    """
+
+    def __init__(self, end_time, report_interval=None):
+        """Constructor of a profiler instance.
+
+        Args:
+            end_time (int): maximum number of time steps of the simulation, used to estimate remaining time.
+            report_interval (float): seconds of wall time between progress reports (default None for no reports).
+        """
+
+        self.end_time = end_time
+        self.report_interval = report_interval
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self.calls = dict.fromkeys(PHASES, 0)
+        self.iterations = 0
+        self.sim_time = 0
+        self.start_time = perf_counter()
+        self.last_report = self.start_time
+
+    def start(self):
+        return perf_counter()
+
+    def stop(self, phase, start):
+        """Method to add the wall time since `start` to a phase.
+
+        Args:
+            phase (str): name of phase (see `PHASES`).
+            start (float): wall time returned by `start`.
+        """
+
+        self.times[phase] += perf_counter() - start
+        self.calls[phase] += 1
+
+    def step(self, time):
+        """Method to record the end of an iteration of the simulation loop, printing progress if due.
+
+        Args:
+            time (int): simulated time step of the iteration.
+        """
+
+        self.iterations += 1
+        self.sim_time = time
+        if self.report_interval is None:
+            return
+
+        now = perf_counter()
+        if now - self.last_report >= self.report_interval:
+            self.last_report = now
+            rate = (time + 1) / (now - self.start_time)
+            # the simulation may stop early once all requests are served, so this is an upper bound
+            eta = (self.end_time - time - 1) / rate
+            print("Time step {} of {} ({:.0f} steps/s, ETA {:.0f} s)".format(time + 1, self.end_time, rate, eta))
+
+    def get_stats(self):
+        """Method to get the accumulated statistics.
+
+        Returns:
+            Dict[str, any]: total wall time, simulated steps, loop iterations, simulated steps per second,
+                and wall time and number of calls of each phase.
+        """
+
+        wall_time = perf_counter() - self.start_time
+        steps = self.sim_time + 1 if self.iterations > 0 else 0
+        return {"wall_time": wall_time,
+                "steps": steps,
+                "iterations": self.iterations,
+                "steps_per_second": steps / wall_time if wall_time > 0 else 0.0,
+                "phases": {phase: {"time": self.times[phase], "calls": self.calls[phase]} for phase in PHASES}}
+
+
+def merge_stats(stats_list):
+    """Function to sum the statistics of several trials.
+
+    Args:
+        stats_list (List[Dict[str, any]]): statistics returned by `PhaseProfiler.get_stats` for each trial.
+
+    Returns:
+        Dict[str, any]: summed statistics, with steps per second over the total wall time.
+    """
+
+    wall_time = sum(stats["wall_time"] for stats in stats_list)
+    steps = sum(stats["steps"] for stats in stats_list)
+    return {"wall_time": wall_time,
+            "steps": steps,
+            "iterations": sum(stats["iterations"] for stats in stats_list),
+            "steps_per_second": steps / wall_time if wall_time > 0 else 0.0,
+            "phases": {phase: {"time": sum(stats["phases"][phase]["time"] for stats in stats_list),
+                               "calls": sum(stats["phases"][phase]["calls"] for stats in stats_list)}
+                       for phase in PHASES}}
+
+
+def format_stats(stats):
+    """Function to format statistics as a table of phases.
+
+    Args:
+        stats (Dict[str, any]): statistics returned by `PhaseProfiler.get_stats` or `merge_stats`.
+
+    Returns:
+        str: table with wall time, share of total wall time and number of calls of each phase.
+    """
+
+    lines = ["{:<12}{:>12}{:>8}{:>12}".format("phase", "time (s)", "%", "calls")]
+    for phase in PHASES:
+        time = stats["phases"][phase]["time"]
+        share = 100 * time / stats["wall_time"] if stats["wall_time"] > 0 else 0.0
+        lines.append("{:<12}{:>12.3f}{:>8.1f}{:>12}".format(phase, time, share, stats["phases"][phase]["calls"]))
+    lines.append("{} steps in {:.3f} s ({:.0f} steps/s, {} loop iterations)".format(
+        stats["steps"], stats["wall_time"], stats["steps_per_second"], stats["iterations"]))
+    return "\n".join(lines)
@@ -1,13 +1,21 @@
 from abc import ABC
-from networkx import Graph, shortest_path
+
+import numpy as np
 
 
 class GenerationProtocol(ABC):
     """Class representing protocol to generate entanglement links.
 
+    The probability distribution is held as an array aligned with the labels of candidate nodes.
+    Links are chosen by searching the cumulative distribution, which is only rebuilt when the distribution changes.
+    This draws the same links as `rng.choice(labels, p=prob_dist)`, without its validation on every call.
+
     Attributes:
         node (Node): node hosting the protocol instance.
-        prob_dist (Dict[int, float]): probability distribution to select direct neighbors to generate entanglement.
+        labels (np.ndarray): labels of nodes that may be selected to generate entanglement.
+        prob_dist (np.ndarray): probability distribution to select nodes in labels to generate entanglement.
+        starting_prob_dist (np.ndarray): initial probability distribution.
+        cumulative_dist (np.ndarray): normalized cumulative distribution, for sampling.
     """
 
     def __init__(self, node):
@@ -17,11 +25,25 @@ class GenerationProtocol(ABC):
             node (Node): node hosting the protocol instance.
         """
         self.node = node
-        self.prob_dist = {}
-        self.starting_prob_dist = {}
+        self.labels = np.array([], dtype=int)
+        self.prob_dist = np.array([])
+        self.starting_prob_dist = np.array([])
+        self.cumulative_dist = np.array([])
+
+    def set_dist(self, labels, prob_dist):
+        self.labels = np.array(labels, dtype=int)
+        self.prob_dist = np.array(prob_dist, dtype=float)
+        self.starting_prob_dist = self.prob_dist.copy()
+        self._update_sampler()
+
+    def _update_sampler(self):
+        cumulative_dist = self.prob_dist.cumsum()
+        cumulative_dist /= cumulative_dist[-1]
+        self.cumulative_dist = cumulative_dist
 
     def reset(self):
-        self.prob_dist = self.starting_prob_dist
+        self.prob_dist = self.starting_prob_dist.copy()
+        self._update_sampler()
 
     def update_dist(self, links_available, links_used):
         pass
@@ -33,9 +55,8 @@ class GenerationProtocol(ABC):
             int: label of node chosen for entanglement
         """
 
-        choices = list(self.prob_dist.keys())
-        probs = list(self.prob_dist.values())
-        return self.node.rng.choice(choices, p=probs)
+        idx = self.cumulative_dist.searchsorted(self.node.rng.random(), side="right")
+        return self.labels[idx]
 
 
 class UniformGenerationProtocol(GenerationProtocol):
@@ -44,21 +65,19 @@ class UniformGenerationProtocol(GenerationProtocol):
     This protocol has probabilities following a uniform distribution.
     """
 
-    def __init__(self, node, network, distance=1):
+    def __init__(self, node, topology, distance=1):
         """Constructor of entanglement generation protocol instance.
 
         Args:
             node (Node): host node.
-            network (np.ndarray): adjacency array for the network.
+            topology (Topology): hop distance tables for the network.
             distance (int): max distance to nodes to select.
         """
 
         super().__init__(node)
-        G = Graph(network)
-        possible = [n.label for n in node.other_nodes if len(shortest_path(G, node.label, n.label)) - 1 <= distance]
+        possible = [n.label for n in node.other_nodes if topology.distance(node.label, n.label) <= distance]
         prob = 1 / len(possible)
-        self.prob_dist = {n: prob for n in possible}
-        self.starting_prob_dist = self.prob_dist
+        self.set_dist(possible, [prob] * len(possible))
 
 
 class PowerLawGenerationProtocol(GenerationProtocol):
@@ -67,21 +86,18 @@ class PowerLawGenerationProtocol(GenerationProtocol):
     This protocol has probabilities following an power law (power -1) distribution, with closer nodes more likely.
     """
 
-    def __init__(self, node, network):
+    def __init__(self, node, topology):
         """Constructor of entanglement generation protocol instance.
 
         Args:
             node (Node): host node.
-            network (np.ndarray): adjacency array for the network.
+            topology (Topology): hop distance tables for the network.
         """
 
         super().__init__(node)
-        G = Graph(network)
-        self.prob_dist = {n.label: 1 / len(shortest_path(G, node.label, n.label)) for n in node.other_nodes}
-        total = sum(self.prob_dist.values())
-        for label in self.prob_dist:
-            self.prob_dist[label] /= total
-        self.starting_prob_dist = self.prob_dist
+        labels = [n.label for n in node.other_nodes]
+        prob_dist = 1 / (topology.distances[node.label, labels] + 1)
+        self.set_dist(labels, prob_dist / prob_dist.sum())
 
 
 class AdaptiveGenerationProtocol(GenerationProtocol):
@@ -104,39 +120,45 @@ class AdaptiveGenerationProtocol(GenerationProtocol):
         self.neighbors = neighbors
 
         init_prob = 1/len(neighbors)
-        self.prob_dist = {neighbor: init_prob for neighbor in neighbors}
-        self.starting_prob_dist = self.prob_dist
+        self.set_dist(neighbors, [init_prob] * len(neighbors))
 
     def update_dist(self, links_available, links_used):
         """Method to update the probability distribution adaptively.
 
         Called when a request is sent to the network.
+        The sampler is only rebuilt if the distribution changes.
 
         Args:
             links_available (List[int]): entanglement links available before the request is submitted.
             links_used (List[int]): entanglement links used to complete the request.
         """
 
-        avail = set(links_available) & set(self.neighbors)
-        used = set(links_used) & set(self.neighbors)
+        avail = np.isin(self.labels, links_available)
+        used = np.isin(self.labels, links_used)
 
         S = avail & used
-        T = used - avail
-        not_used = set(self.neighbors) - used
+        T = used & ~avail
+        not_used = ~used
+
+        prob_dist = self.prob_dist.copy()
 
         # increase probability for links in T
-        if len(T) > 0:
-            sum_st = sum([self.prob_dist[i] for i in (S | T)])
-            new_prob_increase = (self.alpha/len(T)) * (1 - sum_st)
-            for t in T:
-                self.prob_dist[t] += new_prob_increase
+        num_T = np.count_nonzero(T)
+        if num_T > 0:
+            sum_st = prob_dist[S | T].sum()
+            new_prob_increase = (self.alpha/num_T) * (1 - sum_st)
+            prob_dist[T] += new_prob_increase
 
         # decrease probability for links not in T or S
-        if len(not_used) > 0:
-            sum_st_new = sum([self.prob_dist[i] for i in used])
-            new_prob = (1 - sum_st_new) / len(not_used)
-            for i in not_used:
-                self.prob_dist[i] = new_prob
+        num_not_used = np.count_nonzero(not_used)
+        if num_not_used > 0:
+            sum_st_new = prob_dist[used].sum()
+            new_prob = (1 - sum_st_new) / num_not_used
+            prob_dist[not_used] = new_prob
+
+        if not np.array_equal(prob_dist, self.prob_dist):
+            self.prob_dist = prob_dist
+            self._update_sampler()
 
 
 class Request:
@@ -162,36 +184,35 @@ class Request:
         self.pair = pair
         self.route = None
 
-    def get_path(self, network, nodes):
+    def get_path(self, topology, nodes):
         """Get optimal path to service request.
 
         Uses local best effort algorithm based on number of existing entanglement links.
 
         Args:
-            network (numpy.ndarray): Adjacency matrix for the network.
+            topology (Topology): hop distance and next hop tables for the network.
             nodes (List[Node]): List of node objects for the network, contains current entanglement info.
 
         Returns:
             List[int]: Optimal path as list of node labels.
         """
 
-        G = Graph(network)
         end = self.pair[1]
         u_curr = self.pair[0]
         path = [u_curr]
 
         while u_curr != end:
             node = nodes[u_curr]
-            virtual_neighbors = [n for n, count in node.entanglement_link_nums.items() if count > 1]
+            virtual_neighbors = np.flatnonzero(node.entanglement_link_nums > 1).tolist()
             if len(virtual_neighbors) == 0:
-                u = shortest_path(G, u_curr, end)[1]
+                u = topology.next_hop(u_curr, end)
             else:
-                distances = [len(shortest_path(G, v, end)) - 1 for v in virtual_neighbors]
+                distances = topology.distances[virtual_neighbors, end].tolist()
                 minimum_distance = min(distances)
 
                 u = virtual_neighbors[distances.index(minimum_distance)]
-                if len(shortest_path(G, u_curr, end)) <= len(shortest_path(G, u, end)):
-                    u = shortest_path(G, u_curr, end)[1]
+                if topology.distance(u_curr, end) <= topology.distance(u, end):
+                    u = topology.next_hop(u_curr, end)
 
             path.append(u)
             u_curr = u
@@ -0,0 +1,192 @@
+import heapq
+from math import inf
+
+import numpy as np
+
+
+class GenerationScheduler:
+    """Class to schedule background entanglement generation for the event-driven simulation loop.
+
+    Nodes not on the route of the current request attempt to generate entanglement at every time step.
+    Attempts are independent, so the number of steps until the next successful attempt is geometrically distributed.
+    The scheduler samples this time directly and keeps it in an event queue,
+    so that the simulation may skip time steps in which all attempts would fail.
+
+    Attributes:
+        nodes (List[Node]): list of node objects for the network, indexed by label.
+        next_times (List[float]): next time step with a successful attempt for each node (inf if not scheduled).
+        choices (List[Tuple[np.ndarray, np.ndarray]]): labels and cumulative probabilities to choose a link given success.
+        success_probs (List[np.ndarray]): success probability of an attempt with each possible link for each node,
+            aligned with labels of the node's generation protocol.
+        events (List[Tuple[int, int]]): heap of (time, label) events, entries are invalidated lazily by next_times.
+    """
+
+    def __init__(self, nodes):
+        """Constructor of a scheduler instance.
+
+        Args:
+            nodes (List[Node]): list of node objects for the network, with generation protocols already set.
+        """
+
+        self.nodes = nodes
+        self.next_times = [inf] * len(nodes)
+        self.choices = [None] * len(nodes)
+        self.success_probs = [np.array([node.get_success_prob(label) for label in node.generation_protocol.labels])
+                              for node in nodes]
+        self.events = []
+
+    def schedule(self, label, time):
+        """Method to sample the next successful generation attempt of a node.
+
+        Should be called again whenever the probability distribution of the node's generation protocol changes.
+
+        Args:
+            label (int): label of node to schedule.
+            time (int): first time step at which the node attempts generation.
+        """
+
+        node = self.nodes[label]
+        protocol = node.generation_protocol
+        weights = protocol.prob_dist * self.success_probs[label]
+        total = weights.sum()
+        if total <= 0:
+            self.cancel(label)
+            return
+
+        # probability of choosing each link, given that the attempt succeeds
+        self.choices[label] = (protocol.labels, np.cumsum(weights) / total)
+        self.next_times[label] = time + int(node.rng.geometric(min(total, 1))) - 1
+        heapq.heappush(self.events, (self.next_times[label], label))
+
+    def cancel(self, label):
+        self.next_times[label] = inf
+        self.choices[label] = None
+
+    def set_route(self, route, time):
+        """Method to update scheduled nodes when the route of the current request changes.
+
+        Nodes on the route do not generate background entanglement and are removed from the schedule.
+        Nodes off the route without a scheduled event are scheduled starting at the given time.
+
+        Args:
+            route (List[int]): labels of nodes on the route of the current request (empty if there is none).
+            time (int): first time step at which nodes off the route attempt generation.
+        """
+
+        for label in range(len(self.nodes)):
+            if label in route:
+                self.cancel(label)
+            elif self.next_times[label] == inf:
+                self.schedule(label, time)
+
+    def is_due(self, label, time):
+        return self.next_times[label] == time
+
+    def next_time(self):
+        """Method to get the earliest time step with a successful attempt.
+
+        Returns:
+            float: time of next successful attempt (inf if no node is scheduled).
+        """
+
+        while len(self.events) > 0:
+            time, label = self.events[0]
+            if self.next_times[label] == time:
+                return time
+            heapq.heappop(self.events)
+        return inf
+
+    def create_link(self, label, time):
+        """Method to create the entanglement link of a successful attempt and schedule the next one.
+
+        Args:
+            label (int): label of node with a successful attempt.
+            time (int): current time step.
+        """
+
+        node = self.nodes[label]
+        labels, cumulative = self.choices[label]
+        idx = min(int(np.searchsorted(cumulative, node.rng.random(), side="right")), len(labels) - 1)
+        node.build_link(time, self.nodes[labels[idx]])
+        self.schedule(label, time + 1)
+
+
+class BatchGenerator:
+    """Class to draw background entanglement generation of all nodes for a time step in a few array operations.
+
+    Link choices of all nodes are drawn at once by searching the cumulative distributions of their generation
+    protocols, which are stacked into a single sorted array by offsetting each node's row by its label.
+    Success of each attempt is then drawn against the success probability of the chosen link.
+    Only successful attempts (which are rare) are applied by the simulation loop, in order of node label,
+    so that memory conflicts are resolved in the same order as when nodes are run individually.
+    Draws are made from a single random number generator, so results are statistically equivalent,
+    but not identical, to running each node.
+
+    Attributes:
+        nodes (List[Node]): list of node objects for the network, indexed by label.
+        rng (Generator): random number generator for all background generation draws.
+        labels (np.ndarray): N x K array of labels of possible links for each node (padded with -1).
+        success_probs (np.ndarray): N x K array of success probabilities of each possible link (padded with 0).
+        num_choices (np.ndarray): number of possible links for each node.
+        cumulative (np.ndarray): flattened N x K array of cumulative distributions, each offset by the node label
+            (padded with the label plus 1).
+    """
+
+    def __init__(self, nodes, seed=None):
+        """Constructor of a batch generator instance.
+
+        Args:
+            nodes (List[Node]): list of node objects for the network, with generation protocols already set.
+            seed (int or List[int]): seed for the random number generator (default None).
+        """
+
+        self.nodes = nodes
+        self.rng = np.random.default_rng(seed)
+
+        size = len(nodes)
+        self.num_choices = np.array([len(node.generation_protocol.labels) for node in nodes], dtype=int)
+        width = max(int(self.num_choices.max()), 1)
+        self.labels = np.full((size, width), -1, dtype=int)
+        self.success_probs = np.zeros((size, width))
+        for node in nodes:
+            labels = node.generation_protocol.labels
+            self.labels[node.label, :len(labels)] = labels
+            self.success_probs[node.label, :len(labels)] = [node.get_success_prob(label) for label in labels]
+
+        self._cumulative = np.arange(1, size + 1, dtype=float)[:, np.newaxis].repeat(width, axis=1)
+        self.cumulative = self._cumulative.ravel()
+        for node in nodes:
+            self.update(node.label)
+
+    def update(self, label):
+        """Method to copy the cumulative distribution of a node after its generation protocol changed.
+
+        Args:
+            label (int): label of node to update.
+        """
+
+        cumulative_dist = self.nodes[label].generation_protocol.cumulative_dist
+        self._cumulative[label, :len(cumulative_dist)] = cumulative_dist + label
+
+    def draw(self):
+        """Method to draw generation attempts of all nodes for a time step.
+
+        Attempts are drawn for every node (including nodes on the route, which are then ignored),
+        so that the number of draws per step is fixed.
+
+        Returns:
+            Dict[int, int]: label of the other node for each node with a successful attempt.
+        """
+
+        size = len(self.nodes)
+        choices = self.rng.random(size)
+        attempts = self.rng.random(size)
+
+        # search each row of the stacked cumulative distributions (entries of row i lie in (i, i + 1])
+        width = self.labels.shape[1]
+        rows = np.arange(size)
+        idx = np.searchsorted(self.cumulative, choices + rows, side="right") - rows * width
+        np.minimum(idx, self.num_choices - 1, out=idx)
+
+        successes = np.flatnonzero(attempts <= self.success_probs[rows, idx])
+        return dict(zip(successes.tolist(), self.labels[successes, idx[successes]].tolist()))
@@ -1,9 +1,12 @@
+from itertools import islice
 from math import sqrt
 
 import json
 import networkx as nx
 import numpy as np
 
+from protocols import Request
+
 
 def gen_network_json(filename, size, net_type, seed=0):
     if net_type == "ring":
@@ -39,22 +42,154 @@ def gen_traffic_mtx(node_num, rng):
     return mtx
 
 
+class TrafficSchedule:
+    """Class representing traffic matrices that change over time.
+
+    The schedule consists of phases, each with a start time and a traffic matrix.
+    Matrices are piecewise constant, or linearly interpolated between the start times of adjacent phases.
+    As in `gen_pair_queue`, each node pair is requested with probability proportional to its (clipped) element.
+    Sampling tables are precomputed for each phase, and interpolated matrices are sampled as a mixture of the tables
+    of adjacent phases, so that switching phases does not rebuild any table.
+
+    Attributes:
+        start_times (np.ndarray): start time of each phase, increasing (times before the first phase use the first).
+        matrices (np.ndarray): P x N x N array of traffic matrices for each phase.
+        interpolate (bool): if matrices are interpolated between phases.
+        totals (np.ndarray): total weight of each phase's matrix.
+        cumulative_dists (np.ndarray): P x N^2 array of normalized cumulative distributions of node pairs.
+    """
+
+    def __init__(self, start_times, matrices, interpolate=False):
+        """Constructor of a traffic schedule instance.
+
+        Args:
+            start_times (List[int]): start time of each phase, increasing.
+            matrices (List[np.ndarray]): traffic matrix of each phase.
+            interpolate (bool): if matrices are interpolated between phases (default False).
+        """
+
+        self.start_times = np.array(start_times)
+        self.matrices = np.clip(np.array(matrices, dtype=float), 0, 1)
+        self.interpolate = interpolate
+        if len(self.start_times) == 0 or len(self.start_times) != len(self.matrices):
+            raise ValueError("Traffic schedule requires one start time for each matrix")
+        if np.any(np.diff(self.start_times) <= 0):
+            raise ValueError("Traffic schedule start times are not increasing")
+
+        weights = self.matrices.reshape(len(self.matrices), -1)
+        self.totals = weights.sum(axis=1)
+        if not np.all(self.totals > 0):
+            raise ValueError("Traffic matrix has no positive elements")
+        self.cumulative_dists = weights.cumsum(axis=1) / self.totals[:, np.newaxis]
+
+    def get_phases(self, times):
+        return np.maximum(self.start_times.searchsorted(times, side="right") - 1, 0)
+
+    def sample_pairs(self, times, rng):
+        """Method to sample request node pairs given their submission times.
+
+        Args:
+            times (List[int]): submission time of each request.
+            rng (Generator): random number generator to choose node pairs.
+
+        Returns:
+            List[Tuple[int, int]]: origin and destination labels of each request.
+        """
+
+        times = np.asarray(times)
+        phases = self.get_phases(times)
+        if self.interpolate:
+            # choose between tables of current and next phase, with probability proportional to interpolated weight
+            next_phases = np.minimum(phases + 1, len(self.start_times) - 1)
+            spans = self.start_times[next_phases] - self.start_times[phases]
+            fractions = np.clip((times - self.start_times[phases]) / np.maximum(spans, 1), 0, 1)
+            fractions[spans == 0] = 0
+            current_weights = (1 - fractions) * self.totals[phases]
+            next_weights = fractions * self.totals[next_phases]
+            use_next = rng.random(len(times)) * (current_weights + next_weights) < next_weights
+            phases = np.where(use_next, next_phases, phases)
+
+        samples = rng.random(len(times))
+        indices = np.zeros(len(times), dtype=int)
+        for phase in np.unique(phases):
+            in_phase = phases == phase
+            indices[in_phase] = self.cumulative_dists[phase].searchsorted(samples[in_phase], side="right")
+
+        node_num = self.matrices.shape[1]
+        rows, cols = np.divmod(np.minimum(indices, node_num * node_num - 1), node_num)
+        return list(zip(rows.tolist(), cols.tolist()))
+
+
+def load_traffic_schedule(filename):
+    """Function to load a traffic schedule from a JSON file.
+
+    The file holds a list of phases, each with a start time and a matrix,
+    e.g. `{"interpolate": false, "phases": [{"start": 0, "matrix": [[...]]}, ...]}`.
+
+    Args:
+        filename (str): name of JSON traffic schedule file.
+
+    Returns:
+        TrafficSchedule: schedule of traffic matrices.
+    """
+
+    fh = open(filename)
+    schedule = json.load(fh)
+    phases = schedule["phases"]
+    return TrafficSchedule([phase["start"] for phase in phases], [phase["matrix"] for phase in phases],
+                           schedule.get("interpolate", False))
+
+
 # generator of request node pair queue
-def gen_pair_queue(traffic_mtx, node_num, queue_len, rng_mtx, rng_judge):
-    queue = []
-    idx = 0
-    while idx < queue_len:
-        # random selection of traffic matrix element for judgement
-        rand_row = int(rng_mtx.integers(node_num))
-        rand_col = int(rng_mtx.integers(node_num))
-
-        if rng_judge.random() < traffic_mtx[rand_row, rand_col]:
-            # request node pair in form of two-element tuple
-            # first element is the label of the origin node, and second element is the label of the destination
-            queue.append((rand_row, rand_col))
-            idx += 1
-    
-    return queue
+def gen_pair_queue(traffic_mtx, node_num, queue_len, rng_mtx, rng_judge, method="direct"):
+    """Function to generate a queue of request node pairs following the traffic matrix.
+
+    Traffic matrix elements are treated as acceptance probabilities for uniformly chosen node pairs,
+    so that each pair is requested with probability proportional to its element (clipped to [0, 1]).
+    The "direct" method samples all pairs at once from this distribution with `rng_mtx`.
+    The "legacy" method uses the original rejection sampling loop, reproducing queues of earlier experiments.
+
+    Args:
+        traffic_mtx (np.ndarray): traffic matrix.
+        node_num (int): number of nodes in the network.
+        queue_len (int): number of requests.
+        rng_mtx (Generator): random number generator to choose node pairs.
+        rng_judge (Generator): random number generator for acceptance of node pairs ("legacy" method only).
+        method (str): sampling method, "direct" or "legacy" (default "direct").
+
+    Returns:
+        List[Tuple[int, int]]: origin and destination labels of each request.
+    """
+
+    weights = np.clip(np.asarray(traffic_mtx, dtype=float)[:node_num, :node_num], 0, 1)
+    if queue_len > 0 and not weights.any():
+        raise ValueError("Traffic matrix has no positive elements")
+
+    if method == "direct":
+        cumulative = weights.cumsum()
+        cumulative /= cumulative[-1]
+        indices = cumulative.searchsorted(rng_mtx.random(queue_len), side="right")
+        rows, cols = np.divmod(np.minimum(indices, node_num * node_num - 1), node_num)
+        return list(zip(rows.tolist(), cols.tolist()))
+
+    elif method == "legacy":
+        queue = []
+        idx = 0
+        while idx < queue_len:
+            # random selection of traffic matrix element for judgement
+            rand_row = int(rng_mtx.integers(node_num))
+            rand_col = int(rng_mtx.integers(node_num))
+
+            if rng_judge.random() < traffic_mtx[rand_row, rand_col]:
+                # request node pair in form of two-element tuple
+                # first element is the label of the origin node, and second element is the label of the destination
+                queue.append((rand_row, rand_col))
+                idx += 1
+
+        return queue
+
+    else:
+        raise ValueError("Invalid pair sampling method " + method)
 
 
 def gen_request_time_list(start_time, num_request, interval=10):
@@ -70,12 +205,106 @@ def gen_request_time_list(start_time, num_request, interval=10):
 def gen_request_time_list_rand(start_time, num_request, rng, lower_bound=1, upper_bound=10):
     """Function to generate a list of times when a request starts to get served.
     This mimics a central request controller.
-    The time interval between adjacent requests is a random integer.
+    The time interval between adjacent requests is a random integer between the bounds (inclusive).
     This function may be modified to change the distribution.
     """
 
-    request_time_list = [start_time]
-    for i in range(num_request - 1):
-        request_time_list.append(request_time_list[-1] + rng.random.random_integers(lower_bound, high=upper_bound))
+    intervals = rng.integers(lower_bound, upper_bound, size=max(num_request - 1, 0), endpoint=True)
+    request_time_list = start_time + np.concatenate(([0], np.cumsum(intervals)))
+    return request_time_list[:num_request]
 
-    return request_time_list
+
+def gen_request_times(start_time, arrivals="constant", interval=10, rng=None, block_size=1024):
+    """Generator of times when requests are submitted, without a limit on the number of requests.
+
+    Intervals between adjacent requests are drawn in blocks, so that times may be consumed lazily.
+
+    Args:
+        start_time (int): submission time of the first request.
+        arrivals (str): distribution of intervals between requests (default "constant").
+            "constant" intervals are equal to `interval`.
+            "random" intervals are uniform random integers between 1 and 2 * interval - 1.
+            "poisson" intervals are geometric with mean `interval` (a request arrives at each step with probability
+            1 / interval), the discrete-time equivalent of Poisson arrivals.
+        interval (int): mean interval between requests (default 10).
+        rng (Generator): random number generator for "random" and "poisson" arrivals (default None).
+        block_size (int): number of intervals drawn at once (default 1024).
+
+    Yields:
+        int: submission time of each request, strictly increasing.
+    """
+
+    if arrivals not in ("constant", "random", "poisson"):
+        raise ValueError("Invalid arrivals " + arrivals)
+    block_size = max(block_size, 1)
+
+    time = int(start_time)
+    while True:
+        if arrivals == "constant":
+            intervals = [interval] * block_size
+        elif arrivals == "random":
+            intervals = rng.integers(1, 2 * interval - 1, size=block_size, endpoint=True).tolist()
+        else:
+            intervals = rng.geometric(1 / interval, size=block_size).tolist()
+
+        for interval_next in intervals:
+            yield time
+            time += interval_next
+
+
+def gen_request_pairs(traffic_mtx, node_num, rng, block_size=1024, method="direct"):
+    """Generator of request node pairs following the traffic matrix, without a limit on the number of requests.
+
+    Args:
+        traffic_mtx (np.ndarray): traffic matrix.
+        node_num (int): number of nodes in the network.
+        rng (Generator): random number generator to choose node pairs.
+        block_size (int): number of pairs drawn at once (default 1024).
+        method (str): sampling method of `gen_pair_queue`, "direct" or "legacy" (default "direct").
+
+    Yields:
+        Tuple[int, int]: origin and destination labels of each request.
+    """
+
+    while True:
+        yield from gen_pair_queue(traffic_mtx, node_num, max(block_size, 1), rng, rng, method)
+
+
+def gen_requests(times, pairs, num_requests=None):
+    """Function to create requests lazily from submission times and node pairs.
+
+    Args:
+        times (Iterable[int]): submission time of each request (e.g. from `gen_request_times`).
+        pairs (Iterable[Tuple[int, int]]): origin and destination of each request (e.g. from `gen_request_pairs`).
+        num_requests (int): maximum number of requests (default None for as many as times and pairs provide).
+
+    Returns:
+        Iterator[Request]: request source for `run_simulation`.
+    """
+
+    requests = (Request(t, pair) for t, pair in zip(times, pairs))
+    if num_requests is not None:
+        requests = islice(requests, num_requests)
+    return requests
+
+
+def gen_schedule_requests(schedule, times, rng, block_size=1024):
+    """Generator of requests with node pairs following a traffic schedule.
+
+    Args:
+        schedule (TrafficSchedule): schedule of traffic matrices.
+        times (Iterable[int]): submission time of each request (e.g. from `gen_request_times`).
+        rng (Generator): random number generator to choose node pairs.
+        block_size (int): number of pairs drawn at once (default 1024).
+
+    Yields:
+        Request: request for `run_simulation`.
+    """
+
+    times = iter(times)
+    while True:
+        time_block = list(islice(times, block_size))
+        if len(time_block) == 0:
+            return
+        for t, pair in zip(time_block, schedule.sample_pairs(time_block, rng)):
+            yield Request(t, pair)
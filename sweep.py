@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+from main import get_config, run_experiment, gen_trial_data, save_data
+
+
+# sweep parameters
+SWEEP_GRID = {"CONTINUOUS_SCHEME": ["adaptive"],
+              "ADAPT_WEIGHT": [0.01, 0.05, 0.1, 0.2]}  # values for each parameter in main.get_config
+CACHE_DIR = "sweep_cache"  # directory with results for each point, keyed by hash
+OUTPUT_TEMPLATE = "data_{CONTINUOUS_SCHEME}_{ADAPT_WEIGHT}.npz"  # output filename for each point (None to skip)
+NUM_PROCESSES = None  # number of points run in parallel (None for all cores)
+
+# source files of the simulator, included in the hash so that results are recomputed when the code changes
+SOURCE_FILES = ["main.py", "aggregation.py", "footprint.py", "hardware.py", "profiling.py", "protocols.py",
+                "scheduler.py", "simulation_core.py", "topology.py", "traces.py"]
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def get_code_version():
+    """Function to get a hash of the simulator source code.
+
+    Returns:
+        str: hex digest of the source files.
+    """
+
+    sha = hashlib.sha256()
+    for filename in SOURCE_FILES:
+        with open(os.path.join(SOURCE_DIR, filename), "rb") as fh:
+            sha.update(fh.read())
+    return sha.hexdigest()
+
+
+def get_file_hash(filename):
+    sha = hashlib.sha256()
+    with open(filename, "rb") as fh:
+        # read in blocks, as trace files may be large
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def get_config_key(config, code_version):
+    """Function to get the cache key of a configuration.
+
+    The key covers all parameters, the contents of network, traffic, schedule and trace files read by the simulation,
+    and the code version.
+
+    Args:
+        config (Dict[str, any]): simulation parameters (see `main.get_config`).
+        code_version (str): hash of the simulator source code.
+
+    Returns:
+        str: hex digest identifying the results of the configuration.
+    """
+
+    content = {"config": config, "code_version": code_version}
+    if not config["GENERATE_NEW_NET"]:
+        content["network"] = get_file_hash(config["CONFIG"])
+    if not config["GENERATE_NEW_TRAFFIC"]:
+        content["traffic"] = get_file_hash(config["TRAFFIC_MATRIX"])
+    if config["TRAFFIC_SCHEDULE"] is not None:
+        content["traffic_schedule"] = get_file_hash(config["TRAFFIC_SCHEDULE"])
+    if config["TRACE"] is not None:
+        content["trace"] = get_file_hash(config["TRACE"])
+    encoded = json.dumps(content, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def gen_sweep_configs(grid, base_config):
+    """Function to generate the configuration of each point of a parameter grid.
+
+    Args:
+        grid (Dict[str, List]): values of each swept parameter.
+        base_config (Dict[str, any]): values of all other parameters.
+
+    Returns:
+        List[Dict[str, any]]: configuration of each point, with the last parameter of the grid varying fastest.
+    """
+
+    for name in grid:
+        if name not in base_config:
+            raise ValueError("Invalid sweep parameter " + name)
+
+    configs = []
+    for values in product(*grid.values()):
+        config = dict(base_config)
+        config.update(zip(grid.keys(), values))
+        configs.append(config)
+    return configs
+
+
+def run_point(config):
+    """Function to run all trials of a single point of the sweep.
+
+    Args:
+        config (Dict[str, any]): simulation parameters (see `main.get_config`).
+
+    Returns:
+        Dict[str, List]: aggregated data for the point (see `main.gen_data`).
+    """
+
+    return gen_trial_data(run_experiment(config, verbose=False))
+
+
+def save_point(filename, config, code_version, data):
+    # write to a temporary file first, so that interrupted sweeps never leave partial results
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, "w") as fh:
+        json.dump({"config": config, "code_version": code_version, "data": data}, fh, default=str)
+    os.replace(tmp_filename, filename)
+
+
+def run_sweep(grid, base_config=None, cache_dir=CACHE_DIR, num_processes=None):
+    """Function to run all points of a parameter grid that are not already cached.
+
+    Args:
+        grid (Dict[str, List]): values of each swept parameter.
+        base_config (Dict[str, any]): values of all other parameters (default from `main.get_config`).
+        cache_dir (str): directory with cached results.
+        num_processes (int): number of points run in parallel (default None for all cores).
+
+    Returns:
+        List[Tuple[Dict[str, any], str]]: configuration and result filename of each point.
+    """
+
+    if base_config is None:
+        base_config = get_config()
+    os.makedirs(cache_dir, exist_ok=True)
+
+    code_version = get_code_version()
+    configs = gen_sweep_configs(grid, base_config)
+    filenames = [os.path.join(cache_dir, get_config_key(config, code_version) + ".json") for config in configs]
+
+    # only compute missing points (identical points within the grid are computed once)
+    missing = {}
+    for config, filename in zip(configs, filenames):
+        if not os.path.exists(filename):
+            missing[filename] = config
+    print("Running {} of {} points".format(len(missing), len(configs)))
+
+    if len(missing) > 0:
+        with ProcessPoolExecutor(num_processes) as executor:
+            results = executor.map(run_point, missing.values())
+            for i, (filename, config, data) in enumerate(zip(missing.keys(), missing.values(), results)):
+                save_point(filename, config, code_version, data)
+                print("Finished point {} of {}".format(i + 1, len(missing)))
+
+    return list(zip(configs, filenames))
+
+
+def load_point(filename):
+    """Function to load the cached results of a point.
+
+    Args:
+        filename (str): result filename returned by `run_sweep`.
+
+    Returns:
+        Tuple[Dict[str, any], Dict[str, List]]: configuration and aggregated data of the point.
+    """
+
+    with open(filename) as fh:
+        point = json.load(fh)
+    return point["config"], point["data"]
+
+
+def export_sweep(points, template, output_dir="."):
+    """Function to write the data of each point to the files expected by graphing scripts.
+
+    Args:
+        points (List[Tuple[Dict[str, any], str]]): configuration and result filename of each point.
+        template (str): output filename template, formatted with the point's parameters (see `main.save_data`).
+        output_dir (str): directory for output files.
+    """
+
+    for config, filename in points:
+        _, data = load_point(filename)
+        save_data(os.path.join(output_dir, template.format(**config)), data)
+
+
+if __name__ == "__main__":
+    points = run_sweep(SWEEP_GRID, cache_dir=CACHE_DIR, num_processes=NUM_PROCESSES)
+    if OUTPUT_TEMPLATE is not None:
+        export_sweep(points, OUTPUT_TEMPLATE)
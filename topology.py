@@ -0,0 +1,77 @@
+import numpy as np
+
+
+class Topology:
+    """Class holding static topology information for a network.
+
+    A single instance is constructed for the network and shared (read-only) by all nodes, protocols and requests.
+    Hop distances and next hops on shortest paths are computed once for all node pairs,
+    so that they may be looked up in constant time.
+    When several shortest paths exist, the next hop is the neighbor with the lowest label.
+    The network must be connected, so that every pair of nodes has a distance and a path.
+
+    Attributes:
+        size (int): number of nodes in the network.
+        adjacency (List[np.ndarray]): sorted labels of direct neighbors for each node.
+        degrees (np.ndarray): number of direct neighbors for each node.
+        distances (np.ndarray): N x N array of hop distances between nodes.
+        next_hops (np.ndarray): N x N array of next node on a shortest path from row node to column node.
+    """
+
+    def __init__(self, network):
+        """Constructor of a topology instance.
+
+        Args:
+            network (np.ndarray): adjacency array for the network, which must be connected (raises ValueError).
+        """
+
+        network = np.asarray(network)
+        self.size = len(network)
+        self.adjacency = [np.array([j for j in np.flatnonzero(row) if j != i], dtype=int)
+                          for i, row in enumerate(network)]
+        self.degrees = np.array([len(neighbors) for neighbors in self.adjacency], dtype=int)
+
+        self.distances = np.full((self.size, self.size), -1, dtype=np.int32)
+        for source in range(self.size):
+            self.distances[source] = self._bfs(source)
+        if (self.distances < 0).any():
+            unreachable = np.argwhere(self.distances < 0)[0]
+            raise ValueError("Network is not connected, no path from node {} to node {}".format(*unreachable))
+
+        self.next_hops = np.full((self.size, self.size), -1, dtype=np.int32)
+        for u in range(self.size):
+            neighbors = self.adjacency[u]
+            if len(neighbors) > 0:
+                # neighbors one hop closer to each destination; argmax picks the first (lowest label) one
+                closer = self.distances[neighbors] == self.distances[u] - 1
+                hops = neighbors[closer.argmax(axis=0)]
+                hops[~closer.any(axis=0)] = -1
+                self.next_hops[u] = hops
+            self.next_hops[u, u] = u
+
+        # topology is shared between nodes, so prevent accidental modification
+        for arr in self.adjacency + [self.degrees, self.distances, self.next_hops]:
+            arr.setflags(write=False)
+
+    def _bfs(self, source):
+        distances = [-1] * self.size
+        distances[source] = 0
+        frontier = [source]
+        while len(frontier) > 0:
+            next_frontier = []
+            for u in frontier:
+                for v in self.adjacency[u]:
+                    if distances[v] < 0:
+                        distances[v] = distances[u] + 1
+                        next_frontier.append(v)
+            frontier = next_frontier
+        return distances
+
+    def neighbors(self, u):
+        return self.adjacency[u].tolist()
+
+    def distance(self, u, v):
+        return int(self.distances[u, v])
+
+    def next_hop(self, u, v):
+        return int(self.next_hops[u, v])
@@ -0,0 +1,150 @@
+import json
+from itertools import tee
+
+import numpy as np
+from numpy.lib.format import open_memmap
+from numpy.random import default_rng
+
+from simulation_core import gen_pair_queue, gen_request_time_list
+from protocols import Request
+
+
+# record of a single request in trace files
+TRACE_DTYPE = np.dtype([("submit_time", "<i8"), ("origin", "<i4"), ("destination", "<i4")])
+
+# conversion parameters
+TRAFFIC_MATRIX = "traffic_matrix.json"
+TRACE_FILE = "trace.npy"
+NUM_REQUESTS = 200
+REQUEST_START = 200
+REQUEST_INT = 200
+TRACE_SEED = 0
+
+
+def write_trace(filename, times, pairs, num_requests, chunk_size=1 << 20):
+    """Function to write requests to a trace file.
+
+    Traces are stored as NumPy `.npy` files of `TRACE_DTYPE` records, written in chunks through a memory map.
+
+    Args:
+        filename (str): name of trace file.
+        times (Iterable[int]): submission time of each request, strictly increasing.
+        pairs (Iterable[Tuple[int, int]]): origin and destination of each request.
+        num_requests (int): number of requests to write.
+        chunk_size (int): number of records written at once (default 2^20).
+    """
+
+    trace = open_memmap(filename, mode="w+", dtype=TRACE_DTYPE, shape=(num_requests,))
+    times = iter(times)
+    pairs = iter(pairs)
+    for start in range(0, num_requests, chunk_size):
+        chunk = trace[start:start + chunk_size]
+        chunk["submit_time"] = np.fromiter(times, dtype=np.int64, count=len(chunk))
+        chunk[["origin", "destination"]] = np.fromiter(pairs, dtype=[("origin", "<i4"), ("destination", "<i4")],
+                                                        count=len(chunk))
+    trace.flush()
+    del trace
+
+
+def load_trace(filename):
+    """Function to load a trace file as a read-only memory map.
+
+    Args:
+        filename (str): name of trace file.
+
+    Returns:
+        np.memmap: array of `TRACE_DTYPE` records, read from disk as they are accessed.
+    """
+
+    trace = np.load(filename, mmap_mode="r")
+    if trace.dtype != TRACE_DTYPE or trace.ndim != 1:
+        raise ValueError("Invalid trace file " + filename)
+    return trace
+
+
+def gen_trace_requests(trace, net_size, chunk_size=65536):
+    """Generator of requests replayed from a trace.
+
+    Records are converted in chunks, so that only one chunk of a memory mapped trace is held in memory.
+    Each chunk is checked before its requests are submitted, as traces are recorded outside the simulation.
+
+    Args:
+        trace (np.ndarray): array of `TRACE_DTYPE` records (e.g. from `load_trace`).
+        net_size (int): number of nodes in the network, node labels must be below it.
+        chunk_size (int): number of records converted at once (default 65536).
+
+    Yields:
+        Request: request for each record, for `run_simulation`.
+    """
+
+    last_time = None
+    for start in range(0, len(trace), chunk_size):
+        chunk = np.asarray(trace[start:start + chunk_size])
+        times = chunk["submit_time"]
+
+        # the simulation submits at most one request per time step
+        if (last_time is not None and times[0] <= last_time) or np.any(np.diff(times) <= 0):
+            raise ValueError("Trace submission times are not strictly increasing")
+        last_time = times[-1]
+
+        origins = chunk["origin"]
+        destinations = chunk["destination"]
+        if np.any((origins < 0) | (origins >= net_size)) or np.any((destinations < 0) | (destinations >= net_size)):
+            raise ValueError("Invalid trace node labels for network of {} nodes".format(net_size))
+        if np.any(origins == destinations):
+            raise ValueError("Invalid trace request with equal origin and destination")
+
+        for submit_time, origin, destination in zip(times.tolist(), origins.tolist(), destinations.tolist()):
+            yield Request(submit_time, (origin, destination))
+
+
+def convert_traffic_matrix(traffic_file, trace_file, num_requests, start_time, interval, rng, method="direct"):
+    """Function to convert a JSON traffic matrix into a trace with constant intervals between requests.
+
+    Request node pairs are generated by `gen_pair_queue`, so that experiments based on the traffic matrix
+    may be replayed as traces.
+
+    Args:
+        traffic_file (str): name of JSON traffic matrix file.
+        trace_file (str): name of trace file to write.
+        num_requests (int): number of requests.
+        start_time (int): submission time of the first request.
+        interval (int): interval between requests.
+        rng (Generator): random number generator to choose node pairs.
+        method (str): sampling method for `gen_pair_queue` (default "direct").
+    """
+
+    with open(traffic_file) as fh:
+        traffic_mtx = np.array(json.load(fh)["matrix"])
+    pair_queue = gen_pair_queue(traffic_mtx, len(traffic_mtx), num_requests, rng, rng, method)
+    time_list = gen_request_time_list(start_time, num_requests, interval=interval)
+    write_trace(trace_file, time_list, pair_queue, num_requests)
+
+
+def convert_trials(trial_requests, num_requests, trace_template):
+    """Function to convert the requests of each trial into traces.
+
+    Takes the requests of `main.gen_trial_requests`, so that earlier experiments may be re-expressed as traces.
+
+    Args:
+        trial_requests (List[Iterable[Request]]): requests of each trial.
+        num_requests (int): number of requests of each trial.
+        trace_template (str): name of trace files, formatted with the trial number.
+
+    Returns:
+        List[str]: name of trace file for each trial.
+    """
+
+    filenames = []
+    for trial, requests in enumerate(trial_requests):
+        filename = trace_template.format(trial)
+        times, pairs = tee(requests)
+        write_trace(filename, (request.submit_time for request in times), (request.pair for request in pairs),
+                    num_requests)
+        filenames.append(filename)
+    return filenames
+
+
+if __name__ == "__main__":
+    convert_traffic_matrix(TRAFFIC_MATRIX, TRACE_FILE, NUM_REQUESTS, REQUEST_START, REQUEST_INT,
+                           default_rng(TRACE_SEED))